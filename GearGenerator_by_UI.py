@@ -35,7 +35,8 @@ from math import radians, degrees, atan, hypot, sin, cos
 import random
 
 # ---------------Internal modules import--------------
-from gear_calc import createGearOutline, createIntGearOutline, displace, rotate
+from gear_calc import Gear
+from gear_train import GearTrain, GearTrainError, alignPhases
 
 # ----------------------------------------
 
@@ -306,6 +307,7 @@ class mainWindow(QMainWindow):
         verif = self._dataRevision()
         gears=[]
         location = []
+        centres, phases = self._gearTrainPlacement(verif)
         
         for row_g in range(len(verif)):
             gears.append([row_g + 1])
@@ -321,20 +323,30 @@ class mainWindow(QMainWindow):
                 Xcell = float(self.tableWidget.item(row_g, 8).text())
                 Ycell = float(self.tableWidget.item(row_g, 9).text())
                 
-                if check_val:
-                    outline = createIntGearOutline(module_g, teeth_n, pressure_ang, s_or_r_radius)
-
-                else:
-                    outline = createGearOutline(module_g, teeth_n, pressure_ang, s_or_r_radius)
-                    print('outline', outline)
-
-                if Xcell != 0 or Ycell != 0:
-                    outline_diplaced = displace(outline, Xcell, Ycell)
-                    outline = outline_diplaced
-                    print('outline displaces:', outline)
-
-                location.append([Acell, [Xcell, Ycell]])                    
-                gears[row_g].append(outline)
+                # meshed gears follow their parent row, their X, Y cells
+                # show where the train placed them
+                if row_g in centres and self.tableWidget.cellWidget(row_g, 6).currentText() != 'Not Linked':
+                    Xcell, Ycell = centres[row_g]
+                    # not an edit of the user, keep _cellChange out
+                    self.tableWidget.blockSignals(True)
+                    for col, value in ((8, Xcell), (9, Ycell)):
+                        cell = QtWidgets.QTableWidgetItem(str(value))
+                        cell.setFlags(QtCore.Qt.ItemIsEnabled)
+                        cell.setTextAlignment(QtCore.Qt.AlignCenter)
+                        self.tableWidget.setItem(row_g, col, cell)
+                    self.tableWidget.blockSignals(False)
+
+                # internal gears get a rim, external ones a shaft
+                gear = Gear(module_g, teeth_n, pressure_ang, check_val)
+                # teeth turned to interlock with the parent row
+                outline = gear.outline(s_or_r_radius).rotate(phases.get(row_g, 0))
+
+                # placement only composes the gear transform, points are
+                # moved once when the outline is expanded for drawing
+                outline = outline.displace(Xcell, Ycell)
+
+                location.append([Acell, [Xcell, Ycell], module_g])                    
+                gears[row_g].append(outline.toLegacy())
                 print('True: ', row_g + 1)
 
             else:
@@ -345,6 +357,51 @@ class mainWindow(QMainWindow):
         # print(gears)
         return [location, gears]       
 
+    def _gearTrainPlacement(self, verif):
+        # gear centres and phases of the valid rows: "Not Linked" rows at
+        # their X, Y cells, linked rows placed from their parent row at the
+        # A cell angle. A link that can not mesh is skipped with the rows
+        # it drives, the others are still placed
+        gears = {}
+        roots = {}
+        meshes = []
+        for row_g in range(len(verif)):
+            if not verif[row_g]:
+                continue
+            gears[row_g] = Gear(float(self.tableWidget.item(row_g, 5).text()),
+                                int(self.tableWidget.item(row_g, 2).text()),
+                                float(self.tableWidget.item(row_g, 3).text()),
+                                self.tableWidget.cellWidget(row_g, 0).getCheckValue())
+            mesh = self.tableWidget.cellWidget(row_g, 6).currentText()
+            if mesh == 'Not Linked':
+                roots[row_g] = (float(self.tableWidget.item(row_g, 8).text()),
+                                float(self.tableWidget.item(row_g, 9).text()))
+            else:
+                meshes.append((int(mesh) - 1, row_g, float(self.tableWidget.item(row_g, 7).text())))
+        train = GearTrain()
+        for row_g, (Xcell, Ycell) in roots.items():
+            train.add(row_g, gears[row_g], Xcell, Ycell)
+        problems = []
+        while meshes:
+            waiting = []
+            for parent, row_g, angle in meshes:
+                if parent not in train:
+                    waiting.append((parent, row_g, angle))
+                    continue
+                try:
+                    train.mesh(row_g, gears[row_g], parent, angle)
+                except GearTrainError as e:
+                    problems.append('Row ' + str(row_g + 1) + ': ' + str(e))
+            if len(waiting) == len(meshes):
+                break
+            meshes = waiting
+        for parent, row_g, angle in meshes:
+            problems.append('Row ' + str(row_g + 1) + ': row ' + str(parent + 1) + ' is not placed')
+        if problems:
+            self.statusLabel.setText('Gear train: ' + '  |  '.join(problems))
+            self.statusLabel.setStyleSheet("background-color:rgba(122, 167, 146, 150); color: rgb(122, 55, 55)")
+        return train.positions(), alignPhases(train)
+
     def _cellChange(self):
         items = self.tableWidget.selectedItems()
         col = self.tableWidget.currentColumn()
@@ -490,16 +547,17 @@ class Mesh(QComboBox):
         return self.currentText()
 
 
-app = QApplication(sys.argv)
-main_window = mainWindow()
-widget = QtWidgets.QStackedWidget()
-widget.addWidget(main_window)
-# widget.setFixedHeight(300)
-# widget.setFixedWidth(1060)
-widget.resize(658, 650)
-widget.show()
-
-try:
-    sys.exit(app.exec_())
-except:
-    print('Exiting')
\ No newline at end of file
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    main_window = mainWindow()
+    widget = QtWidgets.QStackedWidget()
+    widget.addWidget(main_window)
+    # widget.setFixedHeight(300)
+    # widget.setFixedWidth(1060)
+    widget.resize(658, 650)
+    widget.show()
+
+    try:
+        sys.exit(app.exec_())
+    except:
+        print('Exiting')
\ No newline at end of file
@@ -22,7 +22,13 @@ import sys
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QApplication, QMainWindow
 from matplotlib.backends.backend_qt5agg import (FigureCanvasQTAgg as FigureCanvas, NavigationToolbar2QT as NavigationToolbar)
 from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
+from matplotlib.patches import Circle
+
+from gear_calc import flattenPaths
+
+# maximum distance between the drawn polylines and the gear curves, as a
+# fraction of the gear module
+FLATTEN_TOL = 0.01
 
 class MplCanvas(FigureCanvas):
     def __init__(self, parent=None, width=5, height=4, dpi=150):
@@ -50,26 +56,19 @@ class MplWidget(QWidget):
         if isinstance(gear_outline, list):
             x = 0
             y = 1
-            for i in range(len(gear_outline)):
-                x_gear = []
-                y_gear = []
-                rr = False  # Switch to detect difference between gear format and Radius (shaft or rim) format data
-                # print('valor I: ', i)
-                for j in range(len(gear_outline[i][1])):
-                    # print('valor J:', j)
-                    if isinstance(gear_outline[i][1][j], list) and rr == False:
-                        x_gear.append(gear_outline[i][1][j][x])
-                        y_gear.append(gear_outline[i][1][j][y])
-                    elif gear_outline[i][1][j] == 'R':
-                        radio = gear_outline[i][1][j + 1]
-                        x_location = gear_location[i][1][x]
-                        y_location = gear_location[i][1][y]
-                        rr = True
-
-                self.canvas.axes.add_patch(plt.Circle((x_location, y_location), radio, fill=False))
-                self.canvas.axes.plot(x_gear, y_gear)
-                print('print value ' + str(i))
-                print(x_gear)
+            # rows with gear data, Bezier curves and arcs of all of them are
+            # flattened to polylines in one call
+            rows = [i for i in range(len(gear_outline)) if 'R' in gear_outline[i][1]]
+            polylines = flattenPaths([gear_outline[i][1] for i in rows],
+                                     [FLATTEN_TOL*gear_location[i][2] for i in rows])
+            for i, polyline in zip(rows, polylines):
+                outline = gear_outline[i][1]
+                radio = outline[outline.index('R') + 1]
+                x_location = gear_location[i][1][x]
+                y_location = gear_location[i][1][y]
+
+                self.canvas.axes.add_patch(Circle((x_location, y_location), radio, fill=False))
+                self.canvas.axes.plot(polyline[:, x], polyline[:, y])
 
         # self.canvas.axes = self.canvas.figure.add_subplot(111)
         # self.canvas.axes.plot([0,1,2,3,4], [10,1,20,3,40])
@@ -21,8 +21,9 @@
 import os
 import sys
 import xml.etree.ElementTree as ET
-from gear_calc import createGearOutline, createIntGearOutline
-from gear_to_xml import g_to_xml, synfigFormat
+from itertools import chain
+from gear_calc import createGearOutline, createIntGearOutline, streamGearOutline, streamIntGearOutline
+from gear_to_xml import g_to_xml, writeGear, SynfigWriter, GuidSequence
 #import tkinter as tk
 
 def read_filename(f_name):
@@ -33,7 +34,10 @@ def read_filename(f_name):
     return fileName
 
 
-def gear_generator(format_g):
+def gear_generator(format_g, writer=None, guid_start=0):
+    # With a SynfigWriter the gear is streamed through it and None is
+    # returned, otherwise the gear layer element is built and returned.
+    # Guids are counted from guid_start, past the ones in the document
     address = format_g.find("./param/canvas/layer[@desc='Internal']/param/canvas/layer/param/[@name='text']/string")
     internal = address.text
 
@@ -55,13 +59,20 @@ def gear_generator(format_g):
     module = pitch_diameter_unit/teeth_number
 
     if internal == 'yes':
-        gear_calc = createIntGearOutline(module, teeth_number, pressure_angle, radius_unit)
+        outline = createIntGearOutline if writer is None else streamIntGearOutline
+        gear_calc = outline(module, teeth_number, pressure_angle, radius_unit)
         radius_type = 'Outline Rim'
     elif internal == 'no' or internal == None:
-        gear_calc = createGearOutline(module, teeth_number, pressure_angle, radius_unit)
+        outline = createGearOutline if writer is None else streamGearOutline
+        gear_calc = outline(module, teeth_number, pressure_angle, radius_unit)
         radius_type = 'Shaft'
     group_name = 'Gear'
-    gear_xml = g_to_xml(gear_calc, group_name, radius_type)
+    guids = GuidSequence(internal == 'yes', module, teeth_number, pressure_angle, radius_unit,
+                         start=guid_start)
+    if writer is not None:
+        writeGear(writer, chain.from_iterable(gear_calc), group_name, radius_type, guids)
+        return None
+    gear_xml = g_to_xml(gear_calc, group_name, radius_type, guids)
 
     return gear_xml
 
@@ -85,11 +96,27 @@ def process(f_name):
         addToFile = format_tree.getroot()
     else:
         root.remove(formatG)
-        addToFile = gear_generator(formatG)
-
-    root.append(addToFile)
-    root = synfigFormat(root)
-    tree.write(fileName)
+        addToFile = None
+        guid_start = sum(1 for elem in root.iter() if 'guid' in elem.attrib)
+
+    # the document is streamed to a temporary file with the new layer
+    # appended to the root, the original file is only replaced at the end
+    # and a failed write leaves no temporary file behind
+    tmpName = fileName + '.tmp'
+    try:
+        with open(tmpName, 'wb') as out:
+            writer = SynfigWriter(out)
+            writer.openTree(root)
+            if addToFile is None:
+                gear_generator(formatG, writer, guid_start)
+            else:
+                writer.element(addToFile)
+            writer.close()
+        os.replace(tmpName, fileName)
+    except BaseException:
+        if os.path.exists(tmpName):
+            os.remove(tmpName)
+        raise
 
 
 if len(sys.argv) < 2:
@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+
+#-------------------------------------------------------------------------------
+# Name:         Gear Generator
+# Purpose:      Just for fun
+#
+# Author:       Manuel Astros
+# Email:        manuel.astros1980@gmail.com
+# Web:          https://sites.google.com/view/interpolation/home
+#
+# Created:     25/06/2021
+# Copyright:   (c) astros 2021
+# Licence:     MIT
+# Based on:    Gear Drawing with Bézier Curves (https://www.arc.id.au/GearDrawing.html)
+# -------------------------------------------------------------------------------
+#
+# Reelases:
+# 0.1: First Release
+# ______________________________________________________________________________________
+
+"""Benchmarks for the gear geometry core.
+
+Run all of them with ``python gear_bench.py`` or only some of them with
+``python gear_bench.py <name> [<name> ...]``.
+"""
+import io
+import os
+import re
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+from math import cos, sin, pi, radians, sqrt
+from timeit import Timer
+
+import numpy as np
+
+import gear_calc
+import gear_to_xml
+
+# registered benchmarks, name: function
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    """Register func as a benchmark under its own name"""
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def bestOf(stmt, repeat=5, number=None):
+    """Best time per call in seconds of stmt (callable)"""
+    timer = Timer(stmt)
+    if number is None:
+        number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number))/number
+
+
+def report(label, seconds):
+    print('  {:<44s}{:>12.2f} us'.format(label, seconds*1e6))
+
+
+# ------------------------------------------------------------------------------
+# Chebyshev expansion of the involute
+# ------------------------------------------------------------------------------
+
+def legacyChebyExpnCoeffs(j, func, N=50):
+    """Former per-coefficient loop of involuteBezCoeff"""
+    c = 0
+    for k in range(1, N+1):
+        c += func(cos(pi*(k-0.5)/N)) * cos(pi*j*(k-0.5)/N)
+    return 2*c/N
+
+
+def legacyInvoluteBezCoeff(module, teeth, pressAngle=20, order=3, fstart=0.01, fstop=1):
+    """Former per-order path of involuteBezCoeff: Chebyshev series ->
+    simple polynomial -> Bezier control points, one coordinate at a time"""
+    Rb = module*teeth/2*cos(radians(pressAngle))
+    Ra = module*teeth/2 + module
+    ta = sqrt(Ra**2 - Rb**2)/Rb
+    ts, te = sqrt(fstart)*ta, sqrt(fstop)*ta
+    # Chebyshev polynomials T(k+1) = 2xT(k) - T(k-1) as rows of powers of x
+    T = [[0]*(order+1) for k in range(order+1)]
+    T[0][0] = 1
+    if order > 0:
+        T[1][1] = 1
+    for k in range(1, order):
+        for j in range(order):
+            T[k+1][j+1] = 2*T[k][j]
+        for j in range(order+1):
+            T[k+1][j] -= T[k-1][j]
+
+    def bezCoeffs(func):
+        fnCoeff = [legacyChebyExpnCoeffs(k, func) for k in range(order+1)]
+        poly = [sum(fnCoeff[k]*T[k][pwr] for k in range(order+1)) for pwr in range(order+1)]
+        poly[0] -= fnCoeff[0]/2
+        return [sum(gear_calc.binomial(i, j)*poly[j]/gear_calc.binomial(order, j) for j in range(i+1))
+                for i in range(order+1)]
+
+    def theta(t):
+        return (t*2-1)*(te-ts)/2 + (ts+te)/2
+
+    bx = bezCoeffs(lambda t: Rb*(cos(theta(t))+theta(t)*sin(theta(t))))
+    by = bezCoeffs(lambda t: Rb*(sin(theta(t))-theta(t)*cos(theta(t))))
+    return [[bx[i], by[i]] for i in range(order+1)]
+
+
+@benchmark
+def chebyshev_fit(module=1, teeth=20, pressAngle=20, order=3):
+    """DCT Chebyshev expansion against the former Python loop"""
+    Rb = module*teeth/2*cos(radians(pressAngle))
+    Ra = module*teeth/2 + module
+    ta = sqrt(Ra**2 - Rb**2)/Rb
+    ts, te = sqrt(0.01)*ta, ta
+
+    def involuteXbez(t):
+        theta = (t*2-1)*(te-ts)/2 + (ts+te)/2
+        return Rb*(cos(theta)+theta*sin(theta))
+
+    def loop():
+        return [legacyChebyExpnCoeffs(j, involuteXbez) for j in range(order+1)]
+
+    nodes = gear_calc.chebyNodes(gear_calc.CHEBY_NODES)
+
+    def dct():
+        theta = (nodes*2-1)*(te-ts)/2 + (ts+te)/2
+        return gear_calc.chebyExpnCoeffs(Rb*(np.cos(theta)+theta*np.sin(theta)))[:order+1]
+
+    assert np.allclose(loop(), dct(), rtol=0, atol=1e-9)
+
+    # Bezier control points of the batch path against the former per-order
+    # path, for several orders and gears of a catalog
+    cases = [(m, z, a, p) for m in (0.5, 1, 4) for z in (8, 20, 120)
+             for a in (14.5, 20, 25) for p in (2, 3, 4, 5)]
+    error = 0
+    for m, z, a, p in cases:
+        batch = gear_calc.involuteBezCoeffBatch(m, z, a, p)[0]
+        error = max(error, np.abs(batch - legacyInvoluteBezCoeff(m, z, a, p)).max()/m)
+    print('chebyshev_fit control points, {} gears, max error {:.1e} module'.format(len(cases), error))
+    if error > 1e-12:
+        print('  FAIL: batch control points differ from the per-order path')
+        return False
+
+    tLoop = bestOf(loop)
+    tDct = bestOf(dct)
+    print('chebyshev_fit (order {}, N = {})'.format(order, gear_calc.CHEBY_NODES))
+    report('python loop', tLoop)
+    report('numpy DCT', tDct)
+    print('  speedup x{:.1f}'.format(tLoop/tDct))
+
+    # adaptive node count: involute sections of a catalog in one call
+    count = 1000
+    m = np.full(count, module, dtype=float)
+    z = np.linspace(10, 400, count)
+    for tol in (None, 1e-6, 1e-10):
+        t = bestOf(lambda: gear_calc.involuteBezCoeffBatch(m, z, pressAngle, order, 0.01, 1, tol))
+        report('batch of {} gears, tol={}'.format(count, tol), t)
+
+
+# ------------------------------------------------------------------------------
+# Outline assembly
+# ------------------------------------------------------------------------------
+
+def legacyOutline(toothData, z):
+    """Former createGearOutline teeth loop, O(z**2) list copies"""
+    gearData = gear_calc.rotateTooth(toothData)
+    for i in range(1, z):
+        rotToothData = gear_calc.rotateTooth(toothData, 2*pi*i/z)
+        gearData = gearData + rotToothData[3:]
+    return gearData
+
+
+@benchmark
+def outline_assembly(module=1, teeth=(10, 50, 100, 500, 1000, 5000)):
+    """Vectorized outline assembly against the former teeth loop"""
+    print('outline_assembly (times in ms, list = GearPath converted with toLegacy)')
+    print('  {:>6s}{:>12s}{:>12s}{:>12s}{:>10s}'.format('z', 'loop', 'GearPath', 'list', 'speedup'))
+    for z in teeth:
+        toothData = gear_calc.genGearToothData(module, z)
+        tLoop = bestOf(lambda: legacyOutline(toothData, z), repeat=3 if z <= 1000 else 1)
+        tPath = bestOf(lambda: gear_calc.assembleOutline(toothData, z), repeat=3)
+        tList = bestOf(lambda: gear_calc.assembleOutline(toothData, z).toLegacy(), repeat=3)
+        print('  {:>6d}{:>12.2f}{:>12.2f}{:>12.2f}{:>10.1f}'.format(z, tLoop*1e3, tPath*1e3, tList*1e3, tLoop/tList))
+
+
+@benchmark
+def outline_stream(module=1, teeth=(40, 500, 5000)):
+    """Streamed outlines with the default shaft / rim radius, the joined
+    chunks must match createGearOutline / createIntGearOutline"""
+    print('outline_stream (times in ms, default shaft / rim radius)')
+    print('  {:>6s}{:>12s}{:>12s}{:>10s}'.format('z', 'shaft', 'rim', 'chunks'))
+    for z in teeth:
+        shaft = [item for chunk in gear_calc.streamGearOutline(module, z) for item in chunk]
+        rim = [item for chunk in gear_calc.streamIntGearOutline(module, z) for item in chunk]
+        if shaft != gear_calc.createGearOutline(module, z) or rim != gear_calc.createIntGearOutline(module, z):
+            print('  FAIL: z={} streamed outline differs'.format(z))
+            return False
+        tShaft = bestOf(lambda: list(gear_calc.streamGearOutline(module, z)), repeat=3)
+        tRim = bestOf(lambda: list(gear_calc.streamIntGearOutline(module, z)), repeat=3)
+        chunks = len(list(gear_calc.streamIntGearOutline(module, z)))
+        print('  {:>6d}{:>12.2f}{:>12.2f}{:>10d}'.format(z, tShaft*1e3, tRim*1e3, chunks))
+    print('  ok')
+    return True
+
+
+# ------------------------------------------------------------------------------
+# Inverse involute
+# ------------------------------------------------------------------------------
+
+# largest error allowed for the inverse involute (radians)
+INVERSE_INVOLUTE_TOL = 1e-12
+
+
+@benchmark
+def inverse_involute(count=100000, maxAlpha=radians(80)):
+    """Newton and table inverse involute: throughput and error bound"""
+    alpha = np.concatenate(([0.0], np.logspace(-8, 0, 1000)*maxAlpha,
+                            np.linspace(0, maxAlpha, count)))
+    inv = gear_calc.involute(alpha)
+    table = gear_calc.InvoluteTable(maxAlpha)
+    newtonError = np.abs(gear_calc.inverseInvolute(inv) - alpha).max()
+    tableError = np.abs(table(inv) - alpha).max()
+    polishError = np.abs(table(inv, polish=True) - alpha).max()
+    print('inverse_involute ({} angles up to {:.0f} deg)'.format(len(alpha), np.degrees(maxAlpha)))
+    report('newton', bestOf(lambda: gear_calc.inverseInvolute(inv), repeat=3))
+    report('table', bestOf(lambda: table(inv), repeat=3))
+    report('table + newton step', bestOf(lambda: table(inv, polish=True), repeat=3))
+    # past the table the Newton solver takes over
+    beyond = np.linspace(maxAlpha, radians(89.9), 100)
+    beyondError = max(np.abs(table(gear_calc.involute(beyond), polish=polish) - beyond).max()
+                      for polish in (False, True))
+    print('  max error (rad): newton {:.2e}, table {:.2e}, polished {:.2e}, beyond {:.2e}, limit {:.0e}'.format(
+        newtonError, tableError, polishError, beyondError, INVERSE_INVOLUTE_TOL))
+    if max(newtonError, polishError, beyondError) >= INVERSE_INVOLUTE_TOL:
+        print('  FAIL: error above the limit')
+        return False
+    print('  ok')
+    return True
+
+
+# ------------------------------------------------------------------------------
+# Parameter sweep
+# ------------------------------------------------------------------------------
+
+@benchmark
+def parameter_sweep(teeth=range(6, 201), angles=np.arange(14.5, 30.01, 0.5), modules=(0.5, 1, 2.5)):
+    """Validation map of external and internal teeth over a production grid"""
+    import gear_sweep
+    print('parameter_sweep (z {}..{}, {} angles, {} modules, {} CPUs)'.format(
+        teeth[0], teeth[-1], len(angles), len(modules), os.cpu_count()))
+    ok = True
+    for internal in (False, True):
+        result = []
+        t = bestOf(lambda: result.append(gear_sweep.sweepToothData(teeth, angles, modules, internal)),
+                   repeat=1, number=1)
+        result = result[-1]
+        label = 'internal' if internal else 'external'
+        print('  {:<44s}{:>12.2f} s   {}'.format('{} ({} cells)'.format(label, result.status.size), t,
+                                              result.counts()))
+        ok = ok and result.allPassed()
+    return ok
+
+
+# ------------------------------------------------------------------------------
+# Interference
+# ------------------------------------------------------------------------------
+
+# largest time allowed to check a layout of INTERFERENCE_GEARS gears (s)
+INTERFERENCE_GEARS = 1000
+INTERFERENCE_BUDGET_S = 1.0
+
+
+def chainLayout(count, chains, gap, seed=3):
+    """Parallel gear chains wandering +-8 deg, rows gap mm apart"""
+    from gear_train import GearTrain
+    rng = np.random.default_rng(seed)
+    train = GearTrain()
+    for c in range(chains):
+        parent = None
+        for k in range(count//chains):
+            gear = gear_calc.Gear(1, int(rng.integers(12, 40)))
+            if parent is None:
+                train.add((c, k), gear, 0, c*(42 + gap))
+            else:
+                train.mesh((c, k), gear, parent, float(rng.uniform(-8, 8)))
+            parent = (c, k)
+    return train
+
+
+@benchmark
+def interference(gaps=(2, 0.5, -3)):
+    """Broad and narrow phase interference check of a large layout"""
+    import gear_interference
+    print('interference ({} gears in 25 chains, budget {} s)'.format(INTERFERENCE_GEARS, INTERFERENCE_BUDGET_S))
+    worst = 0
+    for gap in gaps:
+        train = chainLayout(INTERFERENCE_GEARS, 25, gap)
+        result = []
+        t = bestOf(lambda: result.append(gear_interference.trainInterference(train)), repeat=3, number=1)
+        result = result[-1]
+        worst = max(worst, t)
+        print('  {:<44s}{:>12.3f} s   {} pairs, {} overlaps, min clearance {:.3f}'.format(
+            'rows {} mm apart'.format(gap), t, result.candidates, len(result.overlaps), result.minClearance))
+    return worst < INTERFERENCE_BUDGET_S
+
+
+# largest time allowed for a MESH_STEPS steps clearance sweep of a pair (s)
+MESH_STEPS = 10000
+MESH_BUDGET_S = 5.0
+
+
+@benchmark
+def mesh_clearance(pairs=((20, 40, False), (17, 31, False), (19, 57, True)), spread=0.1):
+    """Full mesh cycle clearance of meshed pairs, centres spread apart"""
+    import gear_interference
+    print('mesh_clearance ({} steps, module 1, centres {} mm apart, budget {} s)'.format(
+        MESH_STEPS, spread, MESH_BUDGET_S))
+    worst = 0
+    for zp, z, internal in pairs:
+        parent, gear = gear_calc.Gear(1, zp), gear_calc.Gear(1, z, internal=internal)
+        result = []
+        t = bestOf(lambda: result.append(gear_interference.meshClearance(parent, gear, steps=MESH_STEPS,
+                                                                         spread=spread)),
+                   repeat=1, number=1)
+        result = result[-1]
+        worst = max(worst, t)
+        print('  {:<44s}{:>12.3f} s   min clearance {:.4f} mm, {} steps interfere'.format(
+            '{} x {}{}'.format(zp, z, ' internal' if internal else ''), t, result.minClearance,
+            int(result.interference.sum())))
+    return worst < MESH_BUDGET_S
+
+
+# ------------------------------------------------------------------------------
+# Synfig export
+# ------------------------------------------------------------------------------
+
+# gear exported and the speedup the streaming writer must reach
+EXPORT_TEETH = 200
+EXPORT_SPEEDUP = 10
+
+
+def exportElementTree(data):
+    return ET.tostring(gear_to_xml.g_to_xml(data, 'Gear', 'Shaft'))
+
+
+def exportStream(data):
+    buffer = io.BytesIO()
+    writer = gear_to_xml.SynfigWriter(buffer)
+    gear_to_xml.writeGear(writer, data, 'Gear', 'Shaft')
+    writer.close()
+    return buffer.getvalue()
+
+
+@benchmark
+def synfig_export(teeth=EXPORT_TEETH, module=0.06):
+    """
+    Outline of a gear to Synfig bytes, both paths must give the same
+    bytes and writeGear must be EXPORT_SPEEDUP times faster end to end.
+    The vertex geometry both paths share (blineVertices, polarVertices)
+    is reported on its own.
+    """
+    data = gear_calc.createGearOutline(module, teeth, 20, 2)
+    tree = exportElementTree(data)
+    stream = exportStream(data)
+    print('synfig_export ({} teeth, {} outline points, {} bytes)'.format(
+        teeth, sum(isinstance(item, list) for item in data), len(tree)))
+    if tree != stream:
+        print('  FAIL: outputs differ')
+        return False
+    tTree = bestOf(lambda: exportElementTree(data))
+    tStream = bestOf(lambda: exportStream(data))
+    report('g_to_xml + ET.tostring', tTree)
+    report('writeGear', tStream)
+    report('vertices (shared)', bestOf(lambda: list(gear_to_xml.polarVertices(gear_to_xml.blineVertices(data)))))
+    speedup = tTree/tStream
+    print('  {:<44s}{:>12.1f} x  required {} x'.format('speedup', speedup, EXPORT_SPEEDUP))
+    if speedup < EXPORT_SPEEDUP:
+        print('  FAIL: below the required speedup')
+        return False
+    print('  ok')
+    return True
+
+
+# ------------------------------------------------------------------------------
+# Cold start
+# ------------------------------------------------------------------------------
+
+# modules loaded by the Synfig plugin and their import time budget (ms)
+PLUGIN_MODULES = ('gear_calc', 'gear_to_xml')
+IMPORT_BUDGET_MS = 250
+# must only be loaded when their feature is used
+LAZY_MODULES = ('matplotlib', 'PyQt5', 'xml.dom.minidom')
+
+
+@benchmark
+def import_time(runs=5):
+    """Cold start of the plugin modules measured with python -X importtime"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    check = 'import sys; print(",".join(m for m in {!r} if m in sys.modules))'.format(LAZY_MODULES)
+    code = 'import {}; {}'.format(', '.join(PLUGIN_MODULES), check)
+    best = {}
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=here,
+                              capture_output=True, text=True, check=True)
+        # "import time: self [us] | cumulative | imported package", top level
+        # imports are the ones without indentation
+        for line in proc.stderr.splitlines():
+            match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\S.*)$', line)
+            if match:
+                name = match.group(2)
+                best[name] = min(best.get(name, float('inf')), int(match.group(1))/1e3)
+    loaded = proc.stdout.strip()
+    total = sum(best.values())
+    print('import_time (best of {} runs, python -X importtime)'.format(runs))
+    for name in PLUGIN_MODULES:
+        print('  {:<44s}{:>12.2f} ms'.format(name + ' (cumulative)', best.get(name, 0)))
+    print('  {:<44s}{:>12.2f} ms  budget {} ms'.format('total', total, IMPORT_BUDGET_MS))
+    if loaded:
+        print('  FAIL: imported eagerly: ' + loaded)
+    elif total > IMPORT_BUDGET_MS:
+        print('  FAIL: over budget')
+    else:
+        print('  ok')
+    return not loaded and total <= IMPORT_BUDGET_MS
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    # benchmarks with a budget return False when it is not met
+    failed = [name for name in names if BENCHMARKS[name]() is False]
+    sys.exit(1 if failed else 0)
@@ -18,13 +18,89 @@
 # 0.1: First Release
 #______________________________________________________________________________________
 
-from math import cos, sin, tan, pi, radians, atan, asin, acos, sqrt, pow
+from math import cos, sin, tan, pi, radians, atan, asin, acos, sqrt, pow, hypot, ceil
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
 
 # axes position in vectors:
 x = 0
 y = 1
 # ----------------------
 
+# number of Chebyshev nodes used to fit the involute (N >> order)
+CHEBY_NODES = 50
+# limits of the adaptive node count when a tolerance is requested
+CHEBY_NODES_MIN = 8
+CHEBY_NODES_MAX = 1024
+
+
+# Chebyshev nodes cos(pi*(k-0.5)/N), k = 1..N
+#------------------------------------------
+@lru_cache(maxsize=None)
+def chebyNodes(N):
+    nodes = np.cos(pi*(np.arange(1, N+1)-0.5)/N)
+    nodes.setflags(write=False)
+    return nodes
+
+
+"""
+chebyExpnCoeffs
+Chebyshev expansion coefficients of a function sampled at
+chebyNodes(N), computed for every j = 0..N-1 with a single DCT-II
+(FFT of the even extension) along the last axis:
+    c[j] = 2/N * sum(f(node[k]) * cos(pi*j*(k-0.5)/N))
+samples: array with shape (..., N)
+"""
+def chebyExpnCoeffs(samples):
+    N = samples.shape[-1]
+    spectrum = np.fft.rfft(np.concatenate((samples, samples[..., ::-1]), axis=-1), axis=-1)[..., :N]
+    shift = np.exp(-0.5j*pi*np.arange(N)/N)
+    return (spectrum*shift).real/N
+
+
+"""   * chebyToBezMatrix
+   *
+   * Chebyshev -> simple polynomial -> Bernstein conversion chain for
+   * a given Bezier order, precomputed once and cached. The first
+   * order+1 Chebyshev expansion coefficients multiplied by the matrix
+   * give the Bezier coefficients directly:
+   *     bezCoeffs = chebyCoeffs[:order+1].dot(matrix)
+   *
+   * Returns a matrix with shape (order+1, order+1)"""
+
+
+@lru_cache(maxsize=None)
+def chebyToBezMatrix(order):
+    p = order
+    # Chebyshev polynomial coefficients using formula T(k+1) = 2xT(k) - T(k-1)
+    # which yields one row of powers of x per polynomial
+    # T = [ [ 1,  0,  0,  0,  0,  0],    // T0(x) =  +1
+    #       [ 0,  1,  0,  0,  0,  0],    // T1(x) =   0  +x
+    #       [-1,  0,  2,  0,  0,  0],    // T2(x) =  -1  0  +2xx
+    #       [ 0, -3,  0,  4,  0,  0],    // T3(x) =   0 -3x    0   +4xxx
+    #       ...
+    T = np.zeros((p+1, p+1))
+    T[0, 0] = 1
+    if p > 0:
+        T[1, 1] = 1
+    for j in range(1, p):
+        T[j+1, 1:] = 2*T[j, :-1]
+        T[j+1, :] -= T[j-1, :]
+    # fix the 0th coeff (c0/2 is used in the series)
+    T[0, :] /= 2
+
+    # simple polynomial -> Bezier: bc[i] = sum(binom(i, j)*poly[j]/binom(p, j))
+    toBez = np.zeros((p+1, p+1))
+    for i in range(p+1):
+        for j in range(i+1):
+            toBez[j, i] = binomial(i, j)/binomial(p, j)
+
+    matrix = T.dot(toBez)
+    matrix.setflags(write=False)
+    return matrix
+
+
 """   * involuteBezCoeff
    *
    * Calculation of Bezier coefficients for
@@ -37,118 +113,106 @@ y = 1
    * pressure angle - angle in degrees, usually 14.5 or 20
    * order - the order of the Bezier curve to be fitted [3, 4, 5, ..]
    * fstart - fraction of distance along tooth profile to start
-   * fstop - fraction of distance along profile to stop"""
+   * fstop - fraction of distance along profile to stop
+   * tol - optional tolerance (same units as module) used to pick
+   *       the number of Chebyshev nodes, fixed CHEBY_NODES if None"""
 
 
-def involuteBezCoeff(module, numTeeh, pressAngle=20, order = 3, fstart=0.01, fstop=1):
-    # pitch circle radius
-    Rpitch = module*numTeeh/2
-    # pressure angle. By default = 20°
-    phi = pressAngle
-    # base circle radius
-    Rb = Rpitch*cos(radians(phi))
-    # addendum radius (outer radius)
-    Ra = Rpitch + module
-    # order of Bezier approximation. By default = 3
-    p = order
+def involuteBezCoeff(module, numTeeh, pressAngle=20, order = 3, fstart=0.01, fstop=1, tol=None):
+    return involuteBezCoeffBatch(module, numTeeh, pressAngle, order, fstart, fstop, tol)[0].tolist()
+
+
+"""   * involuteBezCoeffBatch
+   *
+   * Vectorized version of involuteBezCoeff. Every parameter may be a
+   * scalar or an array, they are broadcast against each other and one
+   * set of Bezier coefficients is computed for each resulting tuple.
+   * The involute is sampled at the cached Chebyshev nodes, expanded
+   * with one DCT and converted with the cached chebyToBezMatrix.
+   *
+   * With tol the node count starts at CHEBY_NODES_MIN and is doubled
+   * until the tail of the expansion is below tol for every gear, so
+   * short profile sections use fewer samples than steep ones.
+   *
+   * Returns a numpy array with shape (n, order+1, 2)"""
+
+
+def involuteBezCoeffBatch(module, numTeeh, pressAngle=20, order=3, fstart=0.01, fstop=1, tol=None):
+    m, z, phi, start, stop = np.broadcast_arrays(*[np.atleast_1d(np.asarray(v, dtype=float))
+                                                   for v in (module, numTeeh, pressAngle, fstart, fstop)])
+    m, z, phi, start, stop = [v.ravel() for v in (m, z, phi, start, stop)]
+    # pitch, base and addendum circle radius for every gear
+    Rpitch = m*z/2
+    Rb = Rpitch*np.cos(np.radians(phi))
+    Ra = Rpitch + m
     # involute angle at addendum
-    ta = sqrt(pow(Ra,2)-pow(Rb,2))/Rb
-    # By default = 0.01
-    start = fstart
-    # By default = 1
-    stop = fstop
-    bzCoeffs = []
-
-    def chebyExpnCoeffs(j, func):
-        # any suitable number much larger than  (N>>p)
-        N = 50
-        c = 0
-        cc = 0
-        for k in range(1, N+1):
-            cc = func(cos(pi*(k-0.5)/N)) * cos(pi*j*(k-0.5)/N)
-            c += cc
-        return 2*c/N
-
-    def chebyPolyCoeff(p, func):
-        coeffs = [0 for i in range(p+1)]
-        fnCoeff = [0 for i in range(p+1)]
-        T = [[0 for j in range(p + 1)] for i in range(2)]
-        T[0][0] = 1
-        T[1][1] = 1
-        # now generate the Chebyshev polynomial coefficient using
-        # formula T(k+1) = 2xT(k) - T(k-1) which yields
-        # T = [ [ 1,  0,  0,  0,  0,  0],    // T0(x) =  +1
-        #       [ 0,  1,  0,  0,  0,  0],    // T1(x) =   0  +x
-        #       [-1,  0,  2,  0,  0,  0],    // T2(x) =  -1  0  +2xx
-        #       [ 0, -3,  0,  4,  0,  0],    // T3(x) =   0 -3x    0   +4xxx
-        #       [ 1,  0, -8,  0,  8,  0],    // T4(x) =  +1  0  -8xx       0  +8xxxx
-        #       [ 0,  5,  0,-20,  0, 16]],    // T5(x) =   0  5x    0  -20xxx       0  +16xxxxx
-        for k in range(1, p+1):
-            T.append([0, 0, 0, 0])
-            for j in range(len(T[k])-1):
-                T[k+1][j+1] = 2*T[k][j]
-            for j in range(len(T[k-1])):
-                T[k+1][j] -= T[k-1][j]
-
-        # convert the chebyshev function series into a simple polynomial
-        # and collect like terms, out T polynomial coefficients
-        for k in range(p+1):
-            fnCoeff[k] = chebyExpnCoeffs(k, func)
-            coeffs[k] = 0
-        for k in range(p+1):
-            # loop thru powers of x
-            for pwr in range(p+1):
-                coeffs[pwr] += fnCoeff[k]*T[k][pwr]
-        # fix the 0th coeff
-        coeffs[0] -= chebyExpnCoeffs(0, func)/2
-        return coeffs
-
-    # Equation of involute using the Bezier parameter t as variable
-    def involuteXbez(t):
-        # map t (0 <= t <= 1) onto x (where -1 <= x <= 1)
-        x = t*2-1
-        # map theta (where ts <= theta <= te) from x (-1 <=x <= 1)
-        theta = x*(te-ts)/2 + (ts + te)/2
-        return Rb*(cos(theta)+theta*sin(theta))
-
-    def involuteYbez(t):
-        # map t (0 <= t <= 1) onto x (where -1 <= x <= 1)
-        x = t*2-1
-        # map theta (where ts <= theta <= te) from x (-1 <=x <= 1)
-        theta = x*(te-ts)/2 + (ts + te)/2
-        return Rb*(sin(theta)-theta*cos(theta))
-
-    def binom(n, k):
-        coeff = 1
-        for i in range(n-k+1, n+1):
-            coeff *= i
-        for i in range(1, k+1):
-            coeff /= i
-        return coeff
-
-    def bezCoeff(i, func):
-        # generate the polynomial coeffs in one go
-        bc = 0
-        polyCoeffs = chebyPolyCoeff(p, func)
-        for j in range(i+1):
-            bc += binom(i, j)*polyCoeffs[j]/binom(p, j)
-        return bc
+    ta = np.sqrt(Ra**2 - Rb**2)/Rb
+    # involute angle, theta, at end and start of approx
+    te = np.sqrt(stop)*ta
+    ts = np.sqrt(start)*ta
+
+    def sampleInvolute(N):
+        # map each node (-1 <= t <= 1) onto x = 2t-1 and then onto theta
+        # (ts <= theta <= te when 0 <= t <= 1), shape (2, n, N)
+        theta = (chebyNodes(N)*2-1)[None, :]*((te-ts)/2)[:, None] + ((ts+te)/2)[:, None]
+        return Rb[:, None]*np.array([np.cos(theta) + theta*np.sin(theta),
+                                     np.sin(theta) - theta*np.cos(theta)])
+
+    if tol is None:
+        coeffs = chebyExpnCoeffs(sampleInvolute(CHEBY_NODES))
+    else:
+        N = max(CHEBY_NODES_MIN, 2*(order+1))
+        while True:
+            coeffs = chebyExpnCoeffs(sampleInvolute(N))
+            # the last coefficients bound what is still missing (aliasing)
+            tail = np.abs(coeffs[..., -2:]).max()
+            if tail < tol or N >= CHEBY_NODES_MAX:
+                break
+            N *= 2
 
-    if(fstart < stop):
-        start = fstart
+    bz = coeffs[..., :order+1].dot(chebyToBezMatrix(order))
+    # (2, n, order+1) -> (n, order+1, 2)
+    return np.moveaxis(bz, 0, -1)
+
+
+
+"""   * involutePoints
+   *
+   * Exact alternative to involuteBezCoeff: points on the involute,
+   * evaluated in polar form (radius, getInvolutePolar) for the same
+   * section of the profile. Vertices are spread so that every chord
+   * deviates about the same from the curve: the radius of curvature
+   * is Rb*t (t roll angle), hence chords are equidistributed in t**1.5.
+   *
+   * Parameters:
+   * module, numTeeth, pressure angle, fstart, fstop - see involuteBezCoeff
+   * samples - fixed number of points (at least 2)
+   * tol - maximum chord deviation from the involute (same units as
+   *       module), used when samples is None
+   *
+   * Returns a numpy array with shape (n, 2)"""
 
-    # involute angle, theta, at end of approx
-    te = sqrt(stop)*ta
-    # involute angle, theta, at start of approx
-    ts = sqrt(start)*ta
-    # calc Bezier coeffs
-    for i in range(p+1):
-        bcoeff = [0,0]
-        bcoeff[x] = bezCoeff(i, involuteXbez)
-        bcoeff[y] = bezCoeff(i, involuteYbez)
-        bzCoeffs.append(bcoeff)
-    return bzCoeffs
 
+def involutePoints(module, numTeeh, pressAngle=20, fstart=0.01, fstop=1, samples=None, tol=None):
+    # pitch, base and addendum circle radius
+    Rpitch = module*numTeeh/2
+    Rb = Rpitch*cos(radians(pressAngle))
+    Ra = Rpitch + module
+    # involute (roll) angle at addendum, start and end of the section
+    ta = sqrt(pow(Ra, 2)-pow(Rb, 2))/Rb
+    ts = sqrt(fstart)*ta
+    te = sqrt(fstop)*ta
+    if samples is None:
+        # chord of length L on a curve of radius rho deviates L**2/(8*rho),
+        # integrate the number of chords along the arc length Rb*t*dt
+        chords = sqrt(Rb/(8*tol))*2/3*(pow(te, 1.5)-pow(ts, 1.5))
+        samples = int(np.ceil(chords)) + 1
+    samples = max(samples, 2)
+    t = np.linspace(pow(ts, 1.5), pow(te, 1.5), samples)**(2/3)
+    # radius and polar angle, as getInvolutePolar(Rb, R)
+    R = Rb*np.sqrt(1+t**2)
+    angle = involutePolar(Rb, R)
+    return np.stack((R*np.cos(angle), R*np.sin(angle)), axis=-1)
 
 
 #--------------------------
@@ -166,6 +230,17 @@ def rotate(pt, rads):
             pt[x]*sinA + pt[y]*cosA])
 
 
+# Binomial coefficient n over k
+#------------------------------------------
+def binomial(n, k):
+    coeff = 1
+    for i in range(n-k+1, n+1):
+        coeff *= i
+    for i in range(1, k+1):
+        coeff /= i
+    return coeff
+
+
 # Convert polar coords to cartesian
 #------------------------------------------
 def toCartesian(radius, angle):
@@ -180,9 +255,119 @@ def getInvolutePolar(Rb, R):
     return ((sqrt(pow(R,2) - pow(Rb,2))/Rb)-acos(Rb/R))
 
 
+# Involute function inv(alpha) = tan(alpha) - alpha, alpha is the
+# pressure angle in radians, scalar or array. Small angles use the
+# Taylor series to avoid the cancellation of tan(alpha) - alpha.
+#-------------------------------------------
+def involute(alpha):
+    alpha = np.asarray(alpha, dtype=float)
+    a2 = alpha*alpha
+    series = alpha*a2*(1/3 + a2*(2/15 + a2*(17/315 + a2*62/2835)))
+    return np.where(np.abs(alpha) < 0.01, series, np.tan(alpha) - alpha)
+
+
+# getInvolutePolar for arrays of radius R (R >= Rb),
+# inv(alpha) with cos(alpha) = Rb/R
+#-------------------------------------------
+def involutePolar(Rb, R):
+    alpha = np.arccos(np.minimum(Rb/np.asarray(R, dtype=float), 1))
+    return involute(alpha)
+
+
+# most Newton steps of inverseInvolute, it converges in 3 to 5
+INV_NEWTON_STEPS = 12
+
+
+"""
+inverseInvolute
+Pressure angle alpha (radians) whose involute function is inv, for
+scalars or arrays: solves tan(alpha) - alpha = inv with Newton steps
+(derivative tan(alpha)**2). Initial guess: inverse series in
+(3*inv)**(1/3) for small angles, tan(alpha) ~ inv + pi/2 for large ones.
+Negative values give negative angles (inv is odd), nan / inf raise
+ValueError.
+"""
+def inverseInvolute(inv):
+    v = np.asarray(inv, dtype=float)
+    if not np.isfinite(v).all():
+        raise ValueError('inverse involute of a non finite value')
+    sign = np.sign(v)
+    v = np.abs(v)
+    y = np.cbrt(3*v)
+    alpha = np.where(v < 0.5, y - 2/15*y**3, np.arctan(v + pi/2))
+    alpha = np.minimum(alpha, pi/2 - 1e-9)
+    for i in range(INV_NEWTON_STEPS):
+        tanA = np.tan(alpha)
+        # inv(alpha) ~ alpha**3/3 near 0, keep the step finite at alpha = 0
+        delta = np.where(alpha > 0, (involute(alpha) - v)/np.where(alpha > 0, tanA**2, 1), 0)
+        alpha = np.clip(alpha - delta, 0, pi/2 - 1e-12)
+        if np.all(np.abs(delta) <= 1e-16*np.maximum(alpha, 1e-3)):
+            break
+    return sign*alpha
+
+
+"""
+involuteRadius
+Inverse of getInvolutePolar: radius R at which the involute of base
+radius Rb reaches the polar angle angle (scalars or arrays). table is an
+optional InvoluteTable used instead of the Newton solver.
+"""
+def involuteRadius(Rb, angle, table=None):
+    alpha = inverseInvolute(angle) if table is None else table(angle)
+    return Rb/np.cos(alpha)
+
+
+"""
+InvoluteTable
+Precomputed inverse involute for high-throughput lookups. alpha is
+tabulated on an even grid of u = inv**(1/3), where it is smooth, and
+interpolated with cubic Hermite polynomials using the exact slope
+d(alpha)/du = 3*u**2/tan(alpha)**2. polish=True adds one Newton step,
+which brings the error to rounding level. Values past involute(maxAlpha)
+are solved with inverseInvolute instead of extrapolated.
+maxAlpha: largest pressure angle of the table (radians)
+size: number of grid points
+"""
+class InvoluteTable:
+    __slots__ = ('step', 'top', 'alpha', 'slope')
+
+    def __init__(self, maxAlpha=radians(80), size=2048):
+        u = np.linspace(0, np.cbrt(float(involute(maxAlpha))), size)
+        self.step = u[1] - u[0]
+        self.top = u[-1]
+        self.alpha = inverseInvolute(u**3)
+        tanA = np.tan(self.alpha)
+        # alpha ~ (3*inv)**(1/3) = 3**(1/3)*u near 0
+        self.slope = np.where(u > 0, 3*u**2/np.where(u > 0, tanA**2, 1), np.cbrt(3))
+
+    def __call__(self, inv, polish=False):
+        v = np.asarray(inv, dtype=float)
+        if not np.isfinite(v).all():
+            raise ValueError('inverse involute of a non finite value')
+        u = np.cbrt(np.abs(v))
+        k = np.clip((u/self.step).astype(np.intp), 0, len(self.alpha)-2)
+        t = u/self.step - k
+        h = self.step
+        # cubic Hermite basis
+        t2 = t*t
+        t3 = t2*t
+        alpha = ((2*t3 - 3*t2 + 1)*self.alpha[k] + (t3 - 2*t2 + t)*h*self.slope[k] +
+                 (-2*t3 + 3*t2)*self.alpha[k+1] + (t3 - t2)*h*self.slope[k+1])
+        if polish:
+            tanA = np.tan(alpha)
+            alpha = alpha - np.where(alpha > 0, (involute(alpha) - np.abs(v))/np.where(alpha > 0, tanA**2, 1), 0)
+        # past the last segment, no extrapolation
+        beyond = u > self.top
+        if beyond.any():
+            alpha = np.where(beyond, inverseInvolute(np.where(beyond, np.abs(v), 0)), alpha)
+        return np.sign(v)*alpha
+
+
 # Displace pt {x: , y: } by X or Y disrtance about origin
 #---------------------------------------------------
 def displace(pts, distX, distY):
+    if isinstance(pts, (GearPath, GearOutline)):
+        return pts.displace(distX, distY)
     rr = False  # Switch to detect difference between gear format and Radius (shaft or rim) format data.
     resp = []
     for i in range(len(pts)):
@@ -198,6 +383,482 @@ def displace(pts, distX, distY):
     return resp
 
 
+# Scale tooth data by factor k about origin. Points and arc radii are
+# scaled, arc rotation and flags are kept.
+#---------------------------------------------------
+def scaleToothData(inData, k):
+    outData = []
+    arcArgs = 0
+    for item in inData:
+        if isinstance(item, list):
+            outData.append([item[x]*k, item[y]*k])
+        elif item == 'A':
+            outData.append(item)
+            # rx, ry, x-axis-rotation, large-arc-flag, sweep-flag
+            arcArgs = 5
+            continue
+        elif arcArgs > 3:
+            outData.append(item*k)
+        else:
+            outData.append(item)
+        arcArgs = max(arcArgs - 1, 0)
+    return outData
+
+
+"""
+ToothProfileCache
+LRU cache of tooth profiles computed for module m = 1. As every
+tooth dimension is linear in m, a profile for any module is the unit
+profile scaled by m (see scaleToothData). Keys are (internal, z, phi)
+plus the profile options.
+maxsize: number of profiles kept, the least recently used is dropped
+hits / misses: lookup counters, useful to size the cache
+"""
+class ToothProfileCache:
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._profiles = OrderedDict()
+
+    def get(self, key, build):
+        if key in self._profiles:
+            self.hits += 1
+            self._profiles.move_to_end(key)
+            return self._profiles[key]
+        self.misses += 1
+        profile = build()
+        if self.maxsize > 0:
+            self._profiles[key] = profile
+            self._trim()
+        return profile
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        self._trim()
+
+    def clear(self):
+        self._profiles.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._profiles), 'maxsize': self.maxsize}
+
+    def _trim(self):
+        while len(self._profiles) > max(self.maxsize, 0):
+            self._profiles.popitem(last=False)
+
+
+# shared by genGearToothData and genIntGearToothData
+toothProfileCache = ToothProfileCache()
+
+
+"""
+Affine
+2D affine transform in SVG matrix order [a, b, c, d, e, f]:
+    x' = a*x + c*y + e
+    y' = b*x + d*y + f
+Transforms compose in O(1) without touching any point, t1.then(t2) is
+t1 followed by t2. apply() maps an (n, 2) array of points in bulk.
+"""
+class Affine:
+    __slots__ = ('a', 'b', 'c', 'd', 'e', 'f')
+
+    def __init__(self, a=1, b=0, c=0, d=1, e=0, f=0):
+        self.a = a
+        self.b = b
+        self.c = c
+        self.d = d
+        self.e = e
+        self.f = f
+
+    @classmethod
+    def translation(cls, distX, distY):
+        return cls(e=distX, f=distY)
+
+    @classmethod
+    def rotation(cls, rads):
+        sinA = sin(rads)
+        cosA = cos(rads)
+        return cls(cosA, sinA, -sinA, cosA)
+
+    def then(self, other):
+        return Affine(other.a*self.a + other.c*self.b,
+                      other.b*self.a + other.d*self.b,
+                      other.a*self.c + other.c*self.d,
+                      other.b*self.c + other.d*self.d,
+                      other.a*self.e + other.c*self.f + other.e,
+                      other.b*self.e + other.d*self.f + other.f)
+
+    def isIdentity(self):
+        return (self.a, self.b, self.c, self.d, self.e, self.f) == (1, 0, 0, 1, 0, 0)
+
+    def apply(self, pts):
+        return np.asarray(pts).dot(np.array([[self.a, self.b], [self.c, self.d]])) + np.array([self.e, self.f])
+
+
+"""
+GearPath
+Compact form of the pseudo SVG path lists returned by genGearToothData,
+createGearOutline, createIntGearOutline, ...
+codes: uint8 array, one command code per drawing command (see COMMANDS)
+offsets: int array, command i owns coords[offsets[i]:offsets[i+1]]
+coords: contiguous float64 buffer with the numeric arguments of every
+        command: x, y pairs for M, L, C and Q (any number of points) and
+        rx, ry, rotation, large-arc-flag, sweep-flag, x, y for A
+circle: shaft or rim record that follows the "R" sentinel of an
+        outline, (radius, rows) with the four [x, y, tangent, angle]
+        rows, or None for single tooth data
+fromLegacy / toLegacy convert from and to the list format without loss.
+"""
+class GearPath:
+    # command letters, the index is the command code
+    COMMANDS = 'MLCAZQ'
+    MOVE, LINE, CUBIC, ARC, CLOSE, QUADRATIC = range(6)
+    # number of arc arguments before its end point
+    ARC_ARGS = 5
+
+    __slots__ = ('codes', 'offsets', 'coords', 'circle')
+
+    def __init__(self, codes, offsets, coords, circle=None):
+        self.codes = np.asarray(codes, dtype=np.uint8)
+        self.offsets = np.asarray(offsets, dtype=np.intp)
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64)
+        self.circle = circle
+
+    @classmethod
+    def fromLegacy(cls, data):
+        codes = []
+        offsets = [0]
+        coords = []
+        circle = None
+        i = 0
+        while i < len(data):
+            item = data[i]
+            if item == 'R':
+                # shaft or rim: radius, 4 rows and the closing "z"
+                circle = (data[i+1], tuple(tuple(row) for row in data[i+2:i+6]))
+                break
+            if isinstance(item, str):
+                codes.append(cls.COMMANDS.index(item))
+            elif isinstance(item, list):
+                coords.extend(item[:2])
+            else:
+                coords.append(item)
+            # close the previous command when the next one starts
+            if i+1 == len(data) or isinstance(data[i+1], str):
+                offsets.append(len(coords))
+            i += 1
+        return cls(codes, offsets, coords, circle)
+
+    def toLegacy(self):
+        data = []
+        coords = self.coords.tolist()
+        offsets = self.offsets.tolist()
+        # [x, y] lists of every point built in one go
+        pts = self.points().tolist()
+        n = 0
+        for i, code in enumerate(self.codes.tolist()):
+            data.append(self.COMMANDS[code])
+            start = offsets[i]
+            if code == self.ARC:
+                # radii as they are, rotation and flags back to integers
+                rx, ry, rot, large, sweep = coords[start:start+self.ARC_ARGS]
+                data.extend((rx, ry, int(rot), int(large), int(sweep)))
+                start += self.ARC_ARGS
+            count = (offsets[i+1] - start)//2
+            data.extend(pts[n:n+count])
+            n += count
+        if self.circle is not None:
+            radius, rows = self.circle
+            data = data + ["R", radius]
+            data.extend(list(row) for row in rows)
+            data.append("z")
+        return data
+
+    def pointIndex(self):
+        """Index in coords of the x value of every [x, y] point"""
+        # a coordinate is a point x value when it is at an even distance
+        # from the first point of its command
+        first = self.offsets[:-1] + np.where(self.codes == self.ARC, self.ARC_ARGS, 0)
+        counts = np.diff(self.offsets)
+        owner = np.repeat(np.arange(len(self.codes)), counts)
+        rel = np.arange(len(self.coords)) - first[owner]
+        return np.flatnonzero((rel >= 0) & (rel % 2 == 0))
+
+    def points(self):
+        """All [x, y] points in path order, shape (n, 2)"""
+        index = self.pointIndex()
+        return np.stack((self.coords[index+x], self.coords[index+y]), axis=-1)
+
+    def withPoints(self, pts):
+        """Copy of the path with its points replaced by pts (n, 2)"""
+        index = self.pointIndex()
+        coords = self.coords.copy()
+        coords[index+x] = pts[:, x]
+        coords[index+y] = pts[:, y]
+        return GearPath(self.codes, self.offsets, coords, self.circle)
+
+    def transform(self, affine):
+        """Apply an Affine to every point, the circle rows are kept as in displace()"""
+        if affine.isIdentity():
+            return self
+        return self.withPoints(affine.apply(self.points()))
+
+    def rotate(self, rads):
+        """Rotate every point about origin, the circle is unchanged"""
+        return self.transform(Affine.rotation(rads))
+
+    def displace(self, distX, distY):
+        """Displace every point, the circle rows are kept as in displace()"""
+        return self.transform(Affine.translation(distX, distY))
+
+
+"""
+involuteFlank
+Points of one tooth flank between fractions fs and fe of the involute,
+as a drawing command and its points [[x, y], ...]:
+profile='bezier': Higuchi approximation in 2 cubic sections, split 25%
+                  along the involute ("C" with 6 control points). With
+                  tol the sections and order are chosen by
+                  adaptiveBezFlank to meet tol with the fewest points
+profile='exact': polyline on the exact involute ("L"), see involutePoints
+"""
+def involuteFlank(m, z, phi, fs, fe, profile='bezier', tol=None, samples=None):
+    if profile == 'exact':
+        if samples is None and tol is None:
+            samples = EXACT_SAMPLES
+        return "L", involutePoints(m, z, phi, fs, fe, samples, tol).tolist()
+    if tol is not None:
+        return adaptiveBezFlank(m, z, phi, fs, fe, tol)
+    # Approximate in 2 sections, split 25% along the involute
+    fm = fs+(fe-fs)/4
+    firstBz = involuteBezCoeff(m, z, phi, 3, fs, fm)
+    secondBz = involuteBezCoeff(m, z, phi, 3, fm, fe)
+    # Join the 2 sets of coeffs (skip duplicate mid point)
+    return "C", firstBz + secondBz[1:]
+
+
+# points per flank of the exact profile when neither tol nor samples is given
+EXACT_SAMPLES = 16
+
+# Bezier orders the path format can draw, with their command
+BEZ_COMMANDS = {2: "Q", 3: "C"}
+# most sections tried by adaptiveBezFlank
+BEZ_MAX_SECTIONS = 16
+# points per section where the deviation is measured
+BEZ_CHECK_POINTS = 64
+
+
+# Bernstein basis of the given order at count evenly spaced t (0..1),
+# shape (count, order+1), curve points = basis.dot(bezCoeffs)
+#------------------------------------------
+@lru_cache(maxsize=None)
+def bernsteinBasis(order, count):
+    t = np.linspace(0, 1, count)[:, None]
+    i = np.arange(order+1)[None, :]
+    binoms = np.array([binomial(order, k) for k in range(order+1)])
+    basis = binoms*t**i*(1-t)**(order-i)
+    basis.setflags(write=False)
+    return basis
+
+
+"""
+bezierDeviation
+Maximum distance between Bezier sections and the exact involute of base
+radius Rb. At radius R the involute normal is tangent to the base circle,
+so a polar angle error d turns into a distance of about Rb*d.
+bzCoeffs: array with shape (sections, order+1, 2)
+"""
+def bezierDeviation(bzCoeffs, Rb):
+    pts = np.matmul(bernsteinBasis(bzCoeffs.shape[1]-1, BEZ_CHECK_POINTS), bzCoeffs)
+    R = np.maximum(np.hypot(pts[..., x], pts[..., y]), Rb)
+    angle = involutePolar(Rb, R)
+    delta = np.arctan2(pts[..., y], pts[..., x]) - angle
+    delta = (delta + pi) % (2*pi) - pi
+    return Rb*np.abs(delta).max()
+
+
+"""
+adaptiveBezFlank
+Bezier approximation of the involute between fractions fs and fe with
+the fewest control points whose deviation (bezierDeviation) is below
+tol. Sections are split evenly in roll angle (shorter near the base
+circle where the curvature is higher); every (sections, order) pair is
+tried by increasing number of points, fewer sections first. Only the
+orders the path format can draw are used (BEZ_COMMANDS); if nothing
+meets tol the closest candidate is returned.
+"""
+def adaptiveBezFlank(m, z, phi, fs, fe, tol):
+    Rb = m*z/2*cos(radians(phi))
+    candidates = sorted(((n*p, n, p) for n in range(1, BEZ_MAX_SECTIONS+1) for p in BEZ_COMMANDS))
+    best = None
+    for count, n, p in candidates:
+        # section limits evenly spaced in roll angle (f = (t/ta)**2)
+        f = np.linspace(sqrt(fs), sqrt(fe), n+1)**2
+        f[0], f[-1] = fs, fe
+        bz = involuteBezCoeffBatch(m, z, phi, p, f[:-1], f[1:])
+        error = bezierDeviation(bz, Rb)
+        if best is None or error < best[0]:
+            best = (error, p, bz)
+        if error <= tol:
+            break
+    error, p, bz = best
+    # consecutive sections share their end points
+    pts = np.concatenate((bz[0, :1], bz[:, 1:].reshape(-1, 2)))
+    return BEZ_COMMANDS[p], pts.tolist()
+
+
+"""
+Gear
+Value object of a spur gear: module, number of teeth, pressure angle
+and internal (ring) flag. The derived dimensions (Rpitch, Rb, Ra, Rr,
+fRad, pitchAngle, baseToPitchAngle) follow the metric standards of
+genGearToothData / genIntGearToothData and are computed on first
+access then kept, so a Gear can be handed to every geometry function
+(or batch code) without recalculating them.
+A Gear is immutable, equal gears hash alike.
+"""
+class Gear:
+    __slots__ = ('_module', '_teeth', '_pressureAngle', '_internal',
+                 '_Rpitch', '_Rb', '_Ra', '_Rr', '_fRad', '_pitchAngle', '_baseToPitchAngle')
+
+    def __init__(self, module, teeth, pressureAngle=20, internal=False):
+        self._module = module
+        self._teeth = teeth
+        self._pressureAngle = pressureAngle
+        self._internal = bool(internal)
+        self._Rpitch = self._Rb = self._Ra = self._Rr = None
+        self._fRad = self._pitchAngle = self._baseToPitchAngle = None
+
+    @property
+    def module(self):
+        return self._module
+
+    @property
+    def teeth(self):
+        return self._teeth
+
+    @property
+    def pressureAngle(self):
+        return self._pressureAngle
+
+    @property
+    def internal(self):
+        return self._internal
+
+    # pitch circle to tip circle (ref G.M.Maitra for internal gears)
+    @property
+    def addendum(self):
+        return 0.6*self._module if self._internal else self._module
+
+    # pitch circle to root circle
+    @property
+    def dedendum(self):
+        return 1.25*self._module
+
+    # pitch circle radius
+    @property
+    def Rpitch(self):
+        if self._Rpitch is None:
+            self._Rpitch = self._teeth*self._module/2
+        return self._Rpitch
+
+    @property
+    def pitchDiameter(self):
+        return 2*self.Rpitch
+
+    # involute base circle radius
+    @property
+    def Rb(self):
+        if self._Rb is None:
+            self._Rb = self.Rpitch*cos(radians(self._pressureAngle))
+        return self._Rb
+
+    # addendum (tip) circle radius
+    @property
+    def Ra(self):
+        if self._Ra is None:
+            if self._internal:
+                self._Ra = self.Rpitch - self.addendum
+            else:
+                self._Ra = self.Rpitch + self.addendum
+        return self._Ra
+
+    # root circle radius
+    @property
+    def Rr(self):
+        if self._Rr is None:
+            if self._internal:
+                self._Rr = self.Rpitch + self.dedendum
+            else:
+                self._Rr = self.Rpitch - self.dedendum
+        return self._Rr
+
+    # fillet radius, 1.5 times the clearance
+    @property
+    def fRad(self):
+        if self._fRad is None:
+            if self._internal:
+                self._fRad = 1.5*(0.25*self._module)
+            else:
+                self._fRad = 1.5*(self.dedendum - self.addendum)
+        return self._fRad
+
+    # angle between teeth (rads)
+    @property
+    def pitchAngle(self):
+        if self._pitchAngle is None:
+            self._pitchAngle = 2*pi/self._teeth
+        return self._pitchAngle
+
+    # involute polar angle from base to pitch circle
+    @property
+    def baseToPitchAngle(self):
+        if self._baseToPitchAngle is None:
+            self._baseToPitchAngle = getInvolutePolar(self.Rb, self.Rpitch)
+        return self._baseToPitchAngle
+
+    def toothData(self, profile='bezier', tol=None, samples=None):
+        if self._internal:
+            return genIntGearToothData(self, profile=profile, tol=tol, samples=samples)
+        return genGearToothData(self, profile=profile, tol=tol, samples=samples)
+
+    # shaft of an external gear or rim of an internal one
+    def circle(self, radius=None):
+        if self._internal:
+            return rimCircle(self, rimRadius=radius)
+        return shaftCircle(self, shaftRadius=radius)
+
+    def outline(self, radius=None, profile='bezier', tol=None, samples=None):
+        return GearOutline(self.toothData(profile, tol, samples), self._teeth, self.circle(radius))
+
+    def _key(self):
+        return (self._module, self._teeth, self._pressureAngle, self._internal)
+
+    def __eq__(self, other):
+        if not isinstance(other, Gear):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return 'Gear(module=%r, teeth=%r, pressureAngle=%r, internal=%r)' % self._key()
+
+
+# Accepts either a Gear or the plain (module, teeth, pressure angle)
+# arguments of the geometry functions, returns the Gear
+#---------------------------------------------------
+def asGear(module, teeth=None, pressureAngle=20, internal=False):
+    if isinstance(module, Gear):
+        return module
+    return Gear(module, teeth, pressureAngle, internal)
+
+
 """
 genGearToothData
 Creates an array of drawing commands and their coordinates
@@ -208,24 +869,25 @@ suitable for rotation by later processing if required.
 m : module in milimeter
 z: number of tooth adimensional
 phi: pressure angle in degrees
+profile: 'bezier' (default) or 'exact' involute polyline, see involuteFlank
+tol: maximum deviation from the involute in milimeter, adaptive
+     Bezier sections or chord tolerance of 'exact'
+samples: points per flank of 'exact'
 """
-def genGearToothData(m, z, phi=20):
-    addendum = m
-    dedendum = 1.25*m
-    toothHeight = dedendum - addendum
-    # Rpitch : pitch circle radius
-    Rpitch = z*m/2
+def _genGearToothData(m, z, phi=20, profile='bezier', tol=None, samples=None):
+    gear = Gear(m, z, phi)
+    toothHeight = gear.dedendum - gear.addendum
     # Rb: involute base circle radius. By default 20°
-    Rb = Rpitch*cos(radians(phi))
+    Rb = gear.Rb
     # Ra: Addendum circle radius
-    Ra = Rpitch + addendum
+    Ra = gear.Ra
     # Rr: Root circle radius
-    Rr = Rpitch - dedendum
+    Rr = gear.Rr
     # Fillet radius
-    fRad = 1.5*toothHeight
+    fRad = gear.fRad
     # Pitch angle along circule gear
-    pitchAngle = 2*pi/z
-    baseToPitchAngle = getInvolutePolar(Rb, Rpitch)
+    pitchAngle = gear.pitchAngle
+    baseToPitchAngle = gear.baseToPitchAngle
     # inicializa pitchToFilletAngle
     pitchToFilletAngle = baseToPitchAngle
     filletAngle = atan(fRad/(fRad+Rr))
@@ -245,13 +907,7 @@ def genGearToothData(m, z, phi=20):
         #offset start to top of fillet
         fs = (pow(Rf,2)-pow(Rb,2))/(pow(Ra,2)-pow(Rb,2))
 
-    # Approximate in 2 sections, split 25% along the involute
-    fm = fs+(fe-fs)/4
-    dedBz = involuteBezCoeff(m, z, phi, 3, fs, fm)
-    addBz = involuteBezCoeff(m, z, phi, 3, fm, fe)
-
-    # Join the 2 sets of coeffs
-    inv = dedBz + addBz[1:]
+    flank, inv = involuteFlank(m, z, phi, fs, fe, profile, tol, samples)
 
     # Create the back profile of tooth (mirror image)
     invR = [0 for h in range(len(inv))]
@@ -279,11 +935,11 @@ def genGearToothData(m, z, phi=20):
     if(Rf < Rb):
         # line from fillet up to base circle
         data = data + ["L", inv[0]]
-    data = data + ["C", inv[1], inv[2], inv[3], inv[4], inv[5], inv[6]]
+    data = data + [flank] + inv[1:]
     # arc across addendum circle, sweep 1 for RHC, 0 for SVG
-    data = data + ["A", Ra, Ra, 0, 0, 1, invR[6]]
+    data = data + ["A", Ra, Ra, 0, 0, 1, invR[-1]]
     # arc across addendum circle, sweep 1 for RHC, 0 for SVG
-    data = data + ["C", invR[5], invR[4], invR[3], invR[2], invR[1], invR[0]]
+    data = data + [flank] + invR[-2::-1]
     if(Rf < Rb):
         # line down to top of fillet
         data = data + ["L", filletR]
@@ -299,6 +955,18 @@ def genGearToothData(m, z, phi=20):
     return data
 
 
+def genGearToothData(m, z=None, phi=20, profile='bezier', tol=None, samples=None):
+    if isinstance(m, Gear):
+        if m.internal:
+            raise ValueError('internal gear, use genIntGearToothData or Gear.toothData')
+        m, z, phi = m.module, m.teeth, m.pressureAngle
+    # every length scales with the module, build the profile for m = 1 once
+    unitTol = None if tol is None else tol/m
+    unitData = toothProfileCache.get((False, z, phi, profile, unitTol, samples),
+                                     lambda: _genGearToothData(1, z, phi, profile, unitTol, samples))
+    return scaleToothData(unitData, m)
+
+
 def createGearTooth(module, teeth, pressureAngle=20, rotRads=0):
     m = module
     z = teeth
@@ -331,31 +999,27 @@ to draw a single internal (ring)gear tooth based on a
 circle involute using the metric gear standards. Pseudo SVG
 path data array is returned. Each coord is an object {x: , y: }
 suitable for rotation by later processing if required.
+profile, tol, samples: see genGearToothData
 """
-def genIntGearToothData(m, z, phi):
-    # ****** gear specifications ******
-    # pitch circle to tip circle (ref G.M.Maitra)
-    addendum = 0.6*m
-    # pitch circle to root radius, sets clearance
-    dedendum = 1.25*m
+def _genIntGearToothData(m, z, phi, profile='bezier', tol=None, samples=None):
+    # ****** gear specifications, see Gear ******
+    gear = Gear(m, z, phi, internal=True)
     #-------Calculate radii-------
-    # pitch radius
-    Rpitch = z*m/2
     # base radius
-    Rb = Rpitch*cos(radians(phi))
+    Rb = gear.Rb
     # addendum radius
-    Ra = Rpitch - addendum
+    Ra = gear.Ra
     # root radius
-    Rroot = Rpitch + dedendum
+    Rroot = gear.Rr
     # gear dedendum - pinion addendum
     clearance = 0.25*m
     # radius of top of fillet (end of profile)
     Rf = Rroot - clearance
     # fillet radius, 1 .. 1.5*clearance
-    fRad = 1.5*clearance
+    fRad = gear.fRad
     # angle between teeth (rads)
-    pitchAngle = 2*pi/z
-    baseToPitchAngle = getInvolutePolar(Rb, Rpitch)
+    pitchAngle = gear.pitchAngle
+    baseToPitchAngle = gear.baseToPitchAngle
     # profile starts from base circle
     tipToPitchAngle = baseToPitchAngle
     if(Ra > Rb):
@@ -374,12 +1038,7 @@ def genIntGearToothData(m, z, phi):
         # start profile from addendum (tip circle)
         fs = (pow(Ra, 2) - pow(Rb, 2)) / (pow(Rf, 2) - pow(Rb, 2))
 
-    # approximate in 2 sections, split 25% along the profile
-    fm = fs+(fe-fs)/4
-    addBz = involuteBezCoeff(m, z, phi, 3, fs, fm)
-    dedBz = involuteBezCoeff(m, z, phi, 3, fm, fe)
-    # join the 2 sets of coeffs (skip duplicate mid point)
-    invR = addBz + dedBz[1:]
+    flank, invR = involuteFlank(m, z, phi, fs, fe, profile, tol, samples)
 
     # create the front profile of tooth (mirror image)
     inv = [0 for h in range(len(invR))]
@@ -392,7 +1051,7 @@ def genIntGearToothData(m, z, phi):
 
     #****** calculate coords of section junctions**********
     # top of fillet, front of tooth
-    fillet = [inv[6][x], inv[6][y]]
+    fillet = [inv[-1][x], inv[-1][y]]
     # tip, front of tooth
     tip = toCartesian(Ra, -pitchAngle/4+tipToPitchAngle)
     # addendum, back of tooth
@@ -405,8 +1064,8 @@ def genIntGearToothData(m, z, phi):
     # ****** create the drawing command data array for the tooth *********
     data = []
     # start at top of front profile
-    data = ["M", inv[6]]
-    data = data + ["C", inv[5], inv[4], inv[3], inv[2], inv[1], inv[0]]
+    data = ["M", inv[-1]]
+    data = data + [flank] + inv[-2::-1]
     if(Ra < Rb):
         # line from end of involute to addendum (tip)
         data = data + ["L", tip]
@@ -414,8 +1073,8 @@ def genIntGearToothData(m, z, phi):
     data = data + ["A", Ra, Ra, 0, 0, 1, tipR]
     if (Ra < Rb):
         # line from addendum to start of involute
-        data = data ["L", invR[0]]
-    data = data + ["C", invR[1], invR[2], invR[3], invR[4], invR[5], invR[6]]
+        data = data + ["L", invR[0]]
+    data = data + [flank] + invR[1:]
 
     #there is a section of root circle between fillets
     if (rootR[y] < rootNext[y]):
@@ -430,6 +1089,18 @@ def genIntGearToothData(m, z, phi):
     return data
 
 
+def genIntGearToothData(m, z=None, phi=20, profile='bezier', tol=None, samples=None):
+    if isinstance(m, Gear):
+        if not m.internal:
+            raise ValueError('external gear, use genGearToothData or Gear.toothData')
+        m, z, phi = m.module, m.teeth, m.pressureAngle
+    # every length scales with the module, build the profile for m = 1 once
+    unitTol = None if tol is None else tol/m
+    unitData = toothProfileCache.get((True, z, phi, profile, unitTol, samples),
+                                     lambda: _genIntGearToothData(1, z, phi, profile, unitTol, samples))
+    return scaleToothData(unitData, m)
+
+
 def createIntGearTooth(module, teeth, pressureAngle=20, rotRads=0):
     m = module
     z = teeth
@@ -453,6 +1124,8 @@ def createIntGearTooth(module, teeth, pressureAngle=20, rotRads=0):
     return outData
 
 def rotateTooth(inData, rotRads=0):
+    if isinstance(inData, (GearPath, GearOutline)):
+        return inData.rotate(rotRads)
     rot = rotRads
     outData = []
     # apply arbitrary rotation "rot" to each data point
@@ -469,139 +1142,490 @@ def rotateTooth(inData, rotRads=0):
     return outData
 
 
-def createGearOutline(module, teeth, pressureAngle=20, shaftRadius=None):
-    m = module
-    z = teeth
-    phi = pressureAngle
-    toothData = genGearToothData(m, z, phi)
-    # convert the first tooth into SVG data format
-    rotToothData = rotateTooth(toothData)
-    # add the unrotated first tooth (including initial "M",x,y)
-    gearData = rotToothData
-    for i in range(1, z):
-        # rotate the tooth to its postiton
-        rotToothData = rotateTooth(toothData, 2*pi*i/z)
-        # skip the intial "M",x,y command to make path continuos
-        gearData = gearData + rotToothData[3:]
-    # close the path so it will fill correctly
-    gearData.append("Z")
+# Rotation matrices of the z tooth positions 2*pi*i/z, shape (z, 2, 2),
+# laid out so that rotated = pt.dot(table[i]) as rotate(pt, 2*pi*i/z)
+#---------------------------------------------------
+@lru_cache(maxsize=64)
+def rotationTable(z):
+    angles = 2*pi*np.arange(z)/z
+    sinA = np.sin(angles)
+    cosA = np.cos(angles)
+    table = np.empty((z, 2, 2))
+    table[:, 0, 0] = cosA
+    table[:, 0, 1] = sinA
+    table[:, 1, 0] = -sinA
+    table[:, 1, 1] = cosA
+    table.setflags(write=False)
+    return table
+
+
+"""
+assembleOutline
+Builds the gear path from the data of a single tooth in linear time.
+The tooth points are rotated to the z positions with one product
+against rotationTable(z) and written into a preallocated coordinate
+buffer; only the first tooth keeps its initial "M",x,y so the path is
+continuous. closed adds the final "Z" and circle is the shaft or rim
+record. Returns a GearPath, see GearPath.toLegacy for list data.
+"""
+def assembleOutline(toothData, z, closed=False, circle=None):
+    tooth = toothData if isinstance(toothData, GearPath) else GearPath.fromLegacy(toothData)
+    # everything after the initial "M",x,y is repeated for every tooth
+    bodyStart = tooth.offsets[1]
+    body = tooth.coords[bodyStart:]
+    bodyIndex = tooth.pointIndex()
+    bodyIndex = bodyIndex[bodyIndex >= bodyStart] - bodyStart
+    pts = np.stack((body[bodyIndex+x], body[bodyIndex+y]), axis=-1)
+
+    # (z, k, 2) rotated points of every tooth
+    rotPts = np.matmul(pts[None, :, :], rotationTable(z))
+
+    coords = np.empty(bodyStart + z*len(body))
+    coords[:bodyStart] = tooth.coords[:bodyStart]
+    teeth = coords[bodyStart:].reshape(z, len(body))
+    # arc radii and flags, then the rotated points
+    teeth[:] = body
+    teeth[:, bodyIndex+x] = rotPts[:, :, x]
+    teeth[:, bodyIndex+y] = rotPts[:, :, y]
+
+    bodyOffsets = tooth.offsets[2:] - bodyStart
+    offsets = np.concatenate(([0, bodyStart],
+                              (bodyStart + len(body)*np.arange(z)[:, None] + bodyOffsets[None, :]).ravel()))
+    codes = np.concatenate((tooth.codes[:1], np.tile(tooth.codes[1:], z)))
+    if closed:
+        codes = np.append(codes, GearPath.CLOSE)
+        offsets = np.append(offsets, offsets[-1])
+    return GearPath(codes, offsets, coords, circle)
+
+
+"""
+GearOutline
+Lazy gear outline: only the tooth template and the number of teeth are
+stored, so memory stays the same whatever the tooth count. Teeth are
+expanded on demand:
+    outline[i]      GearPath of tooth i rotated to its position
+    outline[i:j]    list of GearPath for the teeth in the slice
+    for tooth in outline: ...
+    outline.expand()    whole closed GearPath (with shaft or rim)
+    outline.toLegacy()  same as createGearOutline / createIntGearOutline
+Placing the gear (displace, rotate, transformed) only composes its
+Affine transform, points are transformed in bulk when the teeth are
+expanded. As with displace(), the shaft or rim rows are not moved.
+toothData: tooth data of genGearToothData / genIntGearToothData (list or GearPath)
+z: number of teeth
+circle: shaft or rim record, see shaftCircle and rimCircle
+transform: Affine placing the gear, identity by default
+"""
+class GearOutline:
+    __slots__ = ('tooth', 'z', 'circle', 'transform')
+
+    def __init__(self, toothData, z, circle=None, transform=None):
+        self.tooth = toothData if isinstance(toothData, GearPath) else GearPath.fromLegacy(toothData)
+        self.z = z
+        self.circle = circle
+        self.transform = Affine() if transform is None else transform
+
+    def transformed(self, affine):
+        """Same gear with affine applied after its current transform"""
+        return GearOutline(self.tooth, self.z, self.circle, self.transform.then(affine))
+
+    def rotate(self, rads):
+        return self.transformed(Affine.rotation(rads))
+
+    def displace(self, distX, distY):
+        return self.transformed(Affine.translation(distX, distY))
+
+    def __len__(self):
+        return self.z
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.z))]
+        if i < 0:
+            i += self.z
+        if not 0 <= i < self.z:
+            raise IndexError('tooth index out of range')
+        return self.tooth.transform(Affine.rotation(2*pi*i/self.z).then(self.transform))
+
+    def __iter__(self):
+        for i in range(self.z):
+            yield self[i]
+
+    def expand(self):
+        return assembleOutline(self.tooth, self.z, True, self.circle).transform(self.transform)
+
+    def toLegacy(self):
+        return self.expand().toLegacy()
+
+    def segments(self):
+        """
+        Stream the outline in list format one tooth at a time. Joining
+        the yielded chunks gives toLegacy(): first tooth with its initial
+        "M",x,y, the other teeth without it, "Z" closing the last tooth
+        and finally the shaft or rim ("R", r, rows, "z") if there is one.
+        """
+        tooth = self.tooth
+        # tooth without the initial "M",x,y
+        bodyStart = tooth.offsets[1]
+        body = GearPath(tooth.codes[1:], tooth.offsets[1:] - bodyStart, tooth.coords[bodyStart:])
+        for i in range(self.z):
+            place = Affine.rotation(2*pi*i/self.z).then(self.transform)
+            chunk = (tooth if i == 0 else body).transform(place).toLegacy()
+            if i == self.z - 1:
+                chunk.append("Z")
+            yield chunk
+        if self.circle is not None:
+            yield GearPath([], [0], [], self.circle).toLegacy()
+
+
+def createGearOutline(module, teeth=None, pressureAngle=20, shaftRadius=None):
+    gear = asGear(module, teeth, pressureAngle)
+    toothData = genGearToothData(gear)
+    # all the teeth rotated to their position, closed path and shaft
+    gearData = GearOutline(toothData, gear.teeth, shaftCircle(gear, shaftRadius=shaftRadius))
+    return gearData.toLegacy()
+
+
+def createIntGearOutline(module, teeth=None, pressureAngle=20, rimRadius=None):
+    gear = asGear(module, teeth, pressureAngle, internal=True)
+    toothData = genIntGearToothData(gear)
+    # all the teeth rotated to their position, closed path and rim
+    gearData = GearOutline(toothData, gear.teeth, rimCircle(gear, rimRadius=rimRadius))
+    return gearData.toLegacy()
+
+
+"""
+streamGearOutline / streamIntGearOutline
+Generator versions of createGearOutline and createIntGearOutline for
+very large gears: the outline is yielded tooth by tooth (shaft or rim
+last, see GearOutline.segments) so an exporter can write it out
+without holding every vertex in memory.
+"""
+def streamGearOutline(module, teeth=None, pressureAngle=20, shaftRadius=None):
+    gear = asGear(module, teeth, pressureAngle)
+    toothData = genGearToothData(gear)
+    return GearOutline(toothData, gear.teeth, shaftCircle(gear, shaftRadius=shaftRadius)).segments()
+
+
+def streamIntGearOutline(module, teeth=None, pressureAngle=20, rimRadius=None):
+    gear = asGear(module, teeth, pressureAngle, internal=True)
+    toothData = genIntGearToothData(gear)
+    return GearOutline(toothData, gear.teeth, rimCircle(gear, rimRadius=rimRadius)).segments()
+
+
+# Shaft or rim record of radius r: "R", r followed by 4 rows
+# [x, y, tangent, angle], one per quadrant
+#---------------------------------------------------
+def circleRecord(r):
+    return (r, ((r, 0, 1.6568541527*r, 90),
+                (0, r, 1.6568541527*r, 180),
+                (-r, 0, 1.6568541527*r, -90),
+                (0, -r, 1.6568541527*r, 0)))
+
+
+def shaftCircle(module, teeth=None, shaftRadius=None):
     # -----Shaft definition---------------------
-    dedendum = 1.25*m
-    # Rpitch : pitch circle radius
-    Rpitch = z*m/2
-    # Rr: Root circle radius
-    Rr = Rpitch - dedendum
-    if shaftRadius == None or shaftRadius ==0:
-        r = 0
-    if shaftRadius <= 0 or shaftRadius >= 0.95*Rr:
+    gear = asGear(module, teeth)
+    # Rr: Root circle radius of the external gear
+    Rr = gear.Rpitch - gear.dedendum
+    # no radius (None or 0) or one out of range: default shaft
+    if shaftRadius == None or shaftRadius <= 0 or shaftRadius >= 0.95*Rr:
         r = 0.2 * Rr
     else:
         r = shaftRadius
-    gearData = gearData + ["R", r]
-    gearData.append([r, 0, 1.6568541527*r, 90])
-    gearData.append([0, r, 1.6568541527*r, 180])
-    gearData.append([-r, 0, 1.6568541527*r, -90])
-    gearData.append([0, -r, 1.6568541527*r, 0])
-    gearData.append("z")
-
-    return gearData
+    return circleRecord(r)
 
 
-def createIntGearOutline(module, teeth, pressureAngle=20, rimRadius=None):
-    m = module
-    z = teeth
-    phi = pressureAngle
-    toothData = genIntGearToothData(m, z, phi)
-    # convert the first tooth into SVG dta format
-    rotToothData = rotateTooth(toothData)
-    # add the unrotated first tooth (including initial "M",x,y)
-    gearData = rotToothData
-    for i in range(1, z):
-        # rotate the tooth to its postiton
-        rotToothData = rotateTooth(toothData, 2*pi*i/z)
-        # skip the intial "M",x,y command to make path continuos
-        gearData = gearData + rotToothData[3:]
-    # close the path so it will fill correctly
-    gearData.append("Z")
+def rimCircle(module, teeth=None, rimRadius=None):
     # -----Rim Radius definition---------------------
-    addendum = m
-    # Rpitch : pitch circle radius
-    Rpitch = z*m/2
-    # Ra: Addendum circle radius
-    Ra = Rpitch + addendum
-    if rimRadius == None or rimRadius ==0:
-        r = 0
-    if rimRadius <= 0 or rimRadius <= Ra:
+    gear = asGear(module, teeth, internal=True)
+    # Ra: Addendum circle radius of the meshing external gear
+    Ra = gear.Rpitch + gear.module
+    # no radius (None or 0) or one inside the teeth: default rim
+    if rimRadius == None or rimRadius <= Ra:
         r = 1.1 * Ra
     else:
         r = rimRadius
-    # gearData.append(["R", -r,0, "a", r,r, 0,1,0, r*2,0, "a", r,r, 0,1,0, -r*2,0,"z"])
-    gearData = gearData + ["R", r]
-    gearData.append([r, 0, 1.6568541527*r, 90])
-    gearData.append([0, r, 1.6568541527*r, 180])
-    gearData.append([-r, 0, 1.6568541527*r, -90])
-    gearData.append([0, -r, 1.6568541527*r, 0])
-    gearData.append("z")
+    return circleRecord(r)
+
+
+#--------------------------
+#
+# Flattening
+#
+#---------------------------
 
-    return gearData
+# segment kinds used by flattenPaths
+SEG_POINT, SEG_BEZIER, SEG_ARC = range(3)
+
+
+"""
+flattenPaths
+Turns gear paths (GearPath or list format) into polylines whose chords
+deviate at most tol from the drawn curves, all paths in one batched call.
+tol is a number or one tolerance per path:
+"C" / "Q" Bezier: subdivided evenly in t, the number of chords per
+           segment follows Wang's bound sqrt(d*(d-1)/8 * M/tol), M the
+           largest second difference of its control points; points
+           evaluated with a vectorized de Casteljau
+"A" arc:   circular arcs (rx is used) in endpoint form, "sweep" 1 for
+           increasing angle; chord angle 2*acos(1 - tol/r)
+"M", "L":  their points, "Z": back to the first point
+The shaft or rim record is not part of the polyline. Returns a list
+with one (n, 2) array per path.
+"""
+def flattenPaths(paths, tol):
+    if not paths:
+        return []
+    paths = [p if isinstance(p, GearPath) else GearPath.fromLegacy(p) for p in paths]
+    allPts = [p.points() for p in paths]
+    ptOffsets = np.concatenate(([0], np.cumsum([len(pts) for pts in allPts])))
+    allPts = np.concatenate(allPts) if allPts else np.empty((0, 2))
+
+    # every command of every path, with the global index of its first point
+    codes = np.concatenate([p.codes for p in paths]).astype(np.intp)
+    args = np.concatenate([np.diff(p.offsets) for p in paths])
+    argStart = np.concatenate([p.offsets[:-1] + shift for p, shift in
+                               zip(paths, np.cumsum([0] + [len(p.coords) for p in paths[:-1]]))])
+    coords = np.concatenate([p.coords for p in paths])
+    pathOf = np.repeat(np.arange(len(paths)), [len(p.codes) for p in paths])
+    isArc = codes == GearPath.ARC
+    npts = np.where(isArc, args - GearPath.ARC_ARGS, args)//2
+    firstPt = np.cumsum(npts) - npts
+    # the first command ("M") of each path starts the polyline
+    isFirst = np.zeros(len(codes), dtype=bool)
+    isFirst[np.cumsum([0] + [len(p.codes) for p in paths[:-1]])] = True
+
+    # one row per segment: kind, index of its start and end points
+    degree = np.ones(len(codes), dtype=np.intp)
+    degree[codes == GearPath.CUBIC] = 3
+    degree[codes == GearPath.QUADRATIC] = 2
+    nseg = npts//degree - isFirst
+    nseg[codes == GearPath.CLOSE] = 1
+    cmd = np.repeat(np.arange(len(codes)), nseg)
+    j = np.arange(len(cmd)) - np.repeat(np.cumsum(nseg) - nseg, nseg)
+    starts = firstPt[cmd] - 1 + j*degree[cmd] + isFirst[cmd]
+    ends = starts + degree[cmd]
+    kinds = np.full(len(cmd), SEG_POINT, dtype=np.intp)
+    kinds[degree[cmd] > 1] = SEG_BEZIER
+    kinds[isArc[cmd]] = SEG_ARC
+    # "Z" goes back to the first point of its path
+    close = codes[cmd] == GearPath.CLOSE
+    ends[close] = ptOffsets[pathOf[cmd[close]]]
+    pathSegments = np.concatenate(([0], np.cumsum(np.bincount(pathOf[cmd], minlength=len(paths)))))
+    # tolerance of every segment
+    tol = np.broadcast_to(np.asarray(tol, dtype=float), (len(paths),))[pathOf[cmd]]
+
+    # emitted points per segment (its start point belongs to the previous one)
+    counts = np.ones(len(kinds), dtype=np.intp)
+
+    # ---- Bezier segments
+    bezTables = []
+    for deg in (2, 3):
+        seg = np.flatnonzero(degree[cmd] == deg)
+        if len(seg) == 0:
+            continue
+        ctrl = allPts[starts[seg][:, None] + np.arange(deg+1)[None, :]]
+        second = ctrl[:, 2:] - 2*ctrl[:, 1:-1] + ctrl[:, :-2]
+        M = np.hypot(second[..., x], second[..., y]).max(axis=1)
+        n = np.ceil(np.sqrt(deg*(deg-1)/8*M/tol[seg])).astype(np.intp)
+        counts[seg] = np.maximum(n, 1)
+        bezTables.append((seg, ctrl))
+
+    # ---- arc segments
+    arcSeg = np.flatnonzero(kinds == SEG_ARC)
+    if len(arcSeg):
+        arcArgs = argStart[cmd[arcSeg]]
+        arcR = np.abs(coords[arcArgs])
+        large = coords[arcArgs+3] != 0
+        sweep = coords[arcArgs+4] != 0
+        p0 = allPts[starts[arcSeg]]
+        p1 = allPts[ends[arcSeg]]
+        chord = p1 - p0
+        c = np.hypot(chord[:, x], chord[:, y])
+        # radius too small for the chord is scaled up (as SVG does)
+        arcR = np.maximum(arcR, c/2)
+        h = np.sqrt(np.maximum(arcR**2 - (c/2)**2, 0))
+        # center on the left of the chord for a small arc with increasing angle
+        side = np.where(sweep != large, 1.0, -1.0)
+        left = np.stack((-chord[:, y], chord[:, x]), axis=-1)/np.maximum(c, 1e-300)[:, None]
+        center = (p0 + p1)/2 + (side*h)[:, None]*left
+        a0 = np.arctan2(p0[:, y]-center[:, y], p0[:, x]-center[:, x])
+        a1 = np.arctan2(p1[:, y]-center[:, y], p1[:, x]-center[:, x])
+        sweepAngle = np.where(sweep, (a1-a0) % (2*pi), -((a0-a1) % (2*pi)))
+        arcTol = tol[arcSeg]
+        step = 2*np.arccos(np.clip(1 - arcTol/np.maximum(arcR, arcTol), -1, 1))
+        counts[arcSeg] = np.maximum(np.ceil(np.abs(sweepAngle)/step), 1).astype(np.intp)
+
+    # ---- output buffer, every path starts with its first point
+    segOut = np.cumsum(counts) - counts
+    # output index of every segment, shifted by the start points written so far
+    owner = np.repeat(np.arange(len(paths)), np.diff(pathSegments))
+    segOut = segOut + owner + 1
+    total = int(counts.sum()) + len(paths)
+    out = np.empty((total, 2))
+    outStart = np.concatenate(([0], np.cumsum(np.bincount(owner, weights=counts, minlength=len(paths)).astype(np.intp) + 1)))
+    out[outStart[:-1]] = allPts[np.minimum(ptOffsets[:-1], len(allPts)-1)]
+
+    point = np.flatnonzero(kinds == SEG_POINT)
+    out[segOut[point]] = allPts[ends[point]]
+
+    for seg, ctrl in bezTables:
+        n = counts[seg]
+        which = np.repeat(np.arange(len(seg)), n)
+        k = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n) + 1
+        t = (k/n[which])[:, None]
+        # de Casteljau on every emitted point at once
+        level = ctrl[which]
+        while level.shape[1] > 1:
+            level = (1-t[:, None])*level[:, :-1] + t[:, None]*level[:, 1:]
+        out[np.repeat(segOut[seg], n) + k - 1] = level[:, 0]
+
+    if len(arcSeg):
+        n = counts[arcSeg]
+        which = np.repeat(np.arange(len(arcSeg)), n)
+        k = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n) + 1
+        angle = a0[which] + sweepAngle[which]*k/n[which]
+        pts = center[which] + arcR[which][:, None]*np.stack((np.cos(angle), np.sin(angle)), axis=-1)
+        # land exactly on the end points
+        last = k == n[which]
+        pts[last] = p1[which[last]]
+        out[np.repeat(segOut[arcSeg], n) + k - 1] = pts
+
+    return [out[outStart[k]:outStart[k+1]] for k in range(len(paths))]
+
+
+def flattenPath(path, tol):
+    return flattenPaths([path], tol)[0]
+
+
+"""
+arcCubics
+Cubic Bezier sections of the "A" arc from p0 to p1 (radius r, large
+and sweep flags, same circular arc rules as flattenPaths) deviating at
+most tol (> 0) from the circle. The sweep is split in the fewest equal
+sections, of a quarter turn at most, whose error bound
+2*r*sin(q)**6/(27*cos(q)**2), q a quarter of the section angle, is
+below tol; the control points sit 4/3*tan(q)*r along the end tangents.
+Returns [(c1, c2, p), ...] with the last p being p1, no sections when
+p0 and p1 coincide and one straight section for a zero radius.
+"""
+def arcCubics(p0, p1, r, large, sweep, tol):
+    chordX = p1[x] - p0[x]
+    chordY = p1[y] - p0[y]
+    c = hypot(chordX, chordY)
+    if c == 0:
+        return []
+    if r == 0:
+        return [(p0, p1, p1)]
+    # radius too small for the chord is scaled up (as SVG does)
+    r = max(abs(r), c/2)
+    h = sqrt(max(r*r - c*c/4, 0))
+    if not large and 2*h >= c and (r - h)**3/(54*r*(r + h)) <= tol:
+        # a quarter turn at most in one section, the error bound from
+        # cos(angle/2) = h/r: end tangents are the chord turned by half
+        # the angle, control points a along it and b across it
+        a = 2*h/(3*(r + h))
+        b = c/(3*(r + h)) if sweep else -c/(3*(r + h))
+        return [((p0[x] + a*chordX + b*chordY, p0[y] + a*chordY - b*chordX),
+                 (p1[x] - a*chordX + b*chordY, p1[y] - a*chordY - b*chordX), p1)]
+    # center on the left of the chord for a small arc with increasing angle
+    side = h/c if bool(sweep) != bool(large) else -h/c
+    cx = (p0[x] + p1[x])/2 - side*chordY
+    cy = (p0[y] + p1[y])/2 + side*chordX
+    # half the chord seen from the center
+    half = asin(min(c/(2*r), 1))
+    span = 2*pi - 2*half if large else 2*half
+    if not sweep:
+        span = -span
+    n = max(1, ceil(abs(span)/(pi/2) - 1e-9))
+    while True:
+        sinQ = sin(span/(4*n))
+        cosQ = cos(span/(4*n))
+        if 2*r*sinQ**6/(27*cosQ*cosQ) <= tol:
+            break
+        n += 1
+    # control points k/r of the radius turned a quarter away from the ends
+    k = 4/3*sinQ/cosQ
+    if n == 1:
+        return [((p0[x] - k*(p0[y] - cy), p0[y] + k*(p0[x] - cx)),
+                 (p1[x] + k*(p1[y] - cy), p1[y] - k*(p1[x] - cx)), p1)]
+    step = span/n
+    cosStep = cos(step)
+    sinStep = sin(step)
+    sections = []
+    start = p0
+    ux = p0[x] - cx
+    uy = p0[y] - cy
+    for i in range(1, n+1):
+        if i == n:
+            end = p1
+            vx = p1[x] - cx
+            vy = p1[y] - cy
+        else:
+            vx = ux*cosStep - uy*sinStep
+            vy = ux*sinStep + uy*cosStep
+            end = (cx + vx, cy + vy)
+        c1 = (start[x] - k*uy, start[y] + k*ux)
+        c2 = (end[x] + k*vy, end[y] - k*vx)
+        sections.append((c1, c2, end))
+        start = end
+        ux = vx
+        uy = vy
+    return sections
 
-# todo: convert in comment or delete
 #-----------------------Pueba-------------------------------------
-xxa = []
-yya = []
-xxb = []
-yyb = []
-
-# def createGearOutline(module, teeth, pressureAngle=20, shaftRadius=0)
-# da = createGearOutline(10, 40, 20, 60)
-# Dp = z * m
-mo = .15
-teeth_a = 40
-teeth_b = 20
-da = createGearOutline(mo, teeth_a, 20, 2)
-dbb = createGearOutline(mo, teeth_b, 20, 1)
-
-p_diam_a = mo * teeth_a
-p_diam_b = mo * teeth_b
-
-dista = p_diam_a/2 + p_diam_b/2
-
-ang_a = 360 / teeth_a
-ang_b = 360 / teeth_b
-
-
-for i in range(len(da)):
-    if isinstance(da[i], list):
-        xxa.append(da[i][x])
-        yya.append(da[i][y])
-
-angle_loc = 21
-x_loc = dista * cos(radians(angle_loc))
-y_loc = dista * sin(radians(angle_loc))
-
-# if angle_loc % 9 == 0:
-#     teeth_angle_rotation = 9 + angle_loc
-# else:
-#     teeth_angle_rotation = 9+3+1.5
-
-teeth_angle_rotation = (ang_b/2) + angle_loc*3  #*(cos(2*radians(angle_loc))-sin(2*radians(angle_loc)))
-db = rotateTooth(dbb, radians(teeth_angle_rotation))
-disp = displace(db, x_loc, y_loc)
-
-# db = rotateTooth(db, radians(angle_loc))
-for i in range(len(disp)):
-    if isinstance(disp[i], list):
-        # disp = displace(db[i], 0, 1.5)
-        xxb.append(disp[i][x])
-        yyb.append(disp[i][y])
-
-
-# print(da)
-# print(db)
-
-import matplotlib.pyplot as plt
-plt.plot(xxa,yya)
-plt.plot(xxb,yyb)
-plt.show()
+# Run the module as a script to preview two meshed gears, importing it
+# does not compute or draw anything.
+if __name__ == '__main__':
+    xxa = []
+    yya = []
+    xxb = []
+    yyb = []
+
+    # def createGearOutline(module, teeth, pressureAngle=20, shaftRadius=0)
+    # da = createGearOutline(10, 40, 20, 60)
+    # Dp = z * m
+    mo = .15
+    teeth_a = 40
+    teeth_b = 20
+    da = createGearOutline(mo, teeth_a, 20, 2)
+    dbb = createGearOutline(mo, teeth_b, 20, 1)
+
+    p_diam_a = mo * teeth_a
+    p_diam_b = mo * teeth_b
+
+    dista = p_diam_a/2 + p_diam_b/2
+
+
+    for i in range(len(da)):
+        if isinstance(da[i], list):
+            xxa.append(da[i][x])
+            yya.append(da[i][y])
+
+    angle_loc = 21
+    x_loc = dista * cos(radians(angle_loc))
+    y_loc = dista * sin(radians(angle_loc))
+
+    # phase of gear b that interlocks with gear a at angle_loc
+    from gear_train import meshPhase
+    teeth_angle_rotation = meshPhase(Gear(mo, teeth_a), Gear(mo, teeth_b), angle_loc)
+    db = rotateTooth(dbb, teeth_angle_rotation)
+    disp = displace(db, x_loc, y_loc)
+
+    # db = rotateTooth(db, radians(angle_loc))
+    for i in range(len(disp)):
+        if isinstance(disp[i], list):
+            # disp = displace(db[i], 0, 1.5)
+            xxb.append(disp[i][x])
+            yyb.append(disp[i][y])
+
+
+    # print(da)
+    # print(db)
+
+    import matplotlib.pyplot as plt
+    plt.plot(xxa,yya)
+    plt.plot(xxb,yyb)
+    plt.show()
 #-------------------Prueba--------------------------
-
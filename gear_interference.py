@@ -0,0 +1,474 @@
+#!/usr/bin/env python
+
+#-------------------------------------------------------------------------------
+# Name:         Gear Generator
+# Purpose:      Just for fun
+#
+# Author:       Manuel Astros
+# Email:        manuel.astros1980@gmail.com
+# Web:          https://sites.google.com/view/interpolation/home
+#
+# Created:     25/06/2021
+# Copyright:   (c) astros 2021
+# Licence:     MIT
+# Based on:    Gear Drawing with Bézier Curves (https://www.arc.id.au/GearDrawing.html)
+# -------------------------------------------------------------------------------
+#
+# Reelases:
+# 0.1: First Release
+# ______________________________________________________________________________________
+
+# Interference of the gears of a layout that do not mesh with each other.
+# Broad phase: a uniform grid over the outer circle of every gear (tip
+# circle, rim for internal gears). Narrow phase, on the pairs whose
+# circles get closer than the margin: the flattened outlines are tested
+# against each other's solid and their distance measured, vectorized.
+
+from math import pi
+
+import numpy as np
+
+from gear_calc import flattenPath, rimCircle, rotationTable, Affine
+from gear_train import alignPhases, meshOffset, meshPhase
+
+# chord tolerance of the outlines, fraction of the module
+INTERFERENCE_TOL = 0.01
+# meshed pair simulation: chord tolerance and largest clearance measured
+# (SegmentGrid cell), fractions of the module
+MESH_TOL = 0.002
+MESH_REACH = 0.1
+
+
+"""
+GearSolid
+Flattened outline of one gear in its own frame, shared by every placed
+copy of that gear (see solidOf):
+tooth:   polyline of one tooth (n, 2), repeated teeth times
+theta0:  polar angle of the first tooth point
+radius:  tooth radius as a function of the polar angle measured from
+         theta0 over one pitch (angles, radii), overhangs of undercut
+         flanks are filled in so the tooth is star shaped
+rim:     rim radius of an internal gear, None for external gears
+inner:   smallest radius of the outline (tip circle of a ring)
+outer:   largest radius of the solid (tip circle or rim)
+"""
+class GearSolid:
+    __slots__ = ('gear', 'tooth', 'theta0', 'angles', 'radii', 'rim', 'inner', 'outer')
+
+    def __init__(self, gear, rim, tol):
+        self.gear = gear
+        tooth = flattenPath(gear.toothData(tol=None), tol*gear.module)
+        self.tooth = tooth[:-1]
+        theta = np.unwrap(np.arctan2(tooth[:, 1], tooth[:, 0]))
+        r = np.hypot(tooth[:, 0], tooth[:, 1])
+        self.theta0 = theta[0]
+        self.angles = np.maximum.accumulate(theta - theta[0])
+        self.radii = r
+        self.rim = rim
+        self.inner = r.min()
+        self.outer = rim if rim is not None else r.max()
+
+    # radius of the tooth outline at polar angles (gear frame)
+    def radiusAt(self, angles):
+        pitch = self.gear.pitchAngle
+        return np.interp(np.mod(angles - self.theta0, pitch), self.angles, self.radii)
+
+    # every tooth of the gear turned by phase about the origin
+    def outline(self, phase):
+        table = rotationTable(self.gear.teeth)
+        pts = np.einsum('nj,zjk->znk', self.tooth, table).reshape(-1, 2)
+        return Affine.rotation(phase).apply(pts)
+
+
+def solidOf(gear, rim=None, tol=INTERFERENCE_TOL, cache=None):
+    key = (gear, rim, tol)
+    if cache is not None and key in cache:
+        return cache[key]
+    solid = GearSolid(gear, rim, tol)
+    if cache is not None:
+        cache[key] = solid
+    return solid
+
+
+# Closed boundaries of a placed gear as segments (starts, ends): the
+# teeth and, for internal gears, the rim circle flattened at tol
+#---------------------------------------------------
+def _boundary(solid, centre, phase, tol):
+    teeth = solid.outline(phase) + centre
+    starts = [teeth]
+    ends = [np.roll(teeth, -1, axis=0)]
+    if solid.rim is not None:
+        step = 2*np.arccos(max(1 - tol/solid.rim, -1))
+        t = np.linspace(0, 2*pi, max(int(np.ceil(2*pi/step)), 8), endpoint=False)
+        rim = np.column_stack((np.cos(t), np.sin(t)))*solid.rim + centre
+        starts.append(rim)
+        ends.append(np.roll(rim, -1, axis=0))
+    return np.concatenate(starts), np.concatenate(ends)
+
+
+# outlines radius range of a solid: root to tip, tip to root for rings
+def _teethRadii(solid):
+    return solid.radii.min(), solid.radii.max()
+
+
+# True where points (n, 2) lie inside the solid placed at centre, phase,
+# by more than depth
+def _inside(solid, centre, phase, pts, depth=0):
+    d = pts - centre
+    r = np.hypot(d[:, 0], d[:, 1])
+    R = solid.radiusAt(np.arctan2(d[:, 1], d[:, 0]) - phase)
+    if solid.rim is None:
+        return r < R - depth
+    return (r > R + depth) & (r < solid.rim - depth)
+
+
+# Smallest distance from points (n, 2) to segments (starts, ends)
+def _pointSegmentDistance(pts, starts, ends):
+    if len(pts) == 0 or len(starts) == 0:
+        return np.inf
+    d = ends - starts
+    length2 = np.maximum((d*d).sum(axis=1), 1e-300)
+    best = np.inf
+    # chunks keep the (points, segments) temporaries small
+    for i in range(0, len(pts), 256):
+        p = pts[i:i+256, None, :] - starts[None]
+        t = np.clip((p*d).sum(axis=2)/length2, 0, 1)
+        q = p - t[..., None]*d
+        best = min(best, np.sqrt((q*q).sum(axis=2).min()))
+    return best
+
+
+"""
+broadPhase
+Pairs (i, j), i < j, of circles (centres (n, 2), radii (n,)) closer
+than margin, found with a uniform grid of cell about the median
+diameter: each circle is entered in the cells its box covers and only
+circles sharing a cell are compared. Returns an (m, 2) int array.
+"""
+def broadPhase(centres, radii, margin=0):
+    centres = np.asarray(centres, dtype=float).reshape(-1, 2)
+    radii = np.asarray(radii, dtype=float) + margin/2
+    n = len(radii)
+    if n < 2:
+        return np.empty((0, 2), dtype=np.intp)
+    cell = max(2*np.median(radii), 1e-12)
+    lo = np.floor((centres - radii[:, None])/cell).astype(np.int64)
+    hi = np.floor((centres + radii[:, None])/cell).astype(np.int64)
+    span = hi - lo + 1
+    count = span[:, 0]*span[:, 1]
+    # one entry per (circle, covered cell)
+    owner = np.repeat(np.arange(n), count)
+    k = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    cx = lo[owner, 0] + k % span[owner, 0]
+    cy = lo[owner, 1] + k//span[owner, 0]
+    key = (cx - cx.min())*(cy.max() - cy.min() + 1) + (cy - cy.min())
+    order = np.argsort(key, kind='stable')
+    key = key[order]
+    owner = owner[order]
+    bounds = np.flatnonzero(np.diff(key)) + 1
+    starts = np.concatenate(([0], bounds))
+    sizes = np.diff(np.concatenate((starts, [len(key)])))
+    pairs = []
+    for s, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+        i, j = np.triu_indices(size, 1)
+        pairs.append(np.column_stack((owner[s + i], owner[s + j])))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.intp)
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    pairs = np.unique(pairs[:, 0]*n + pairs[:, 1])
+    pairs = np.column_stack((pairs//n, pairs % n))
+    d = np.hypot(*(centres[pairs[:, 0]] - centres[pairs[:, 1]]).T)
+    return pairs[d < radii[pairs[:, 0]] + radii[pairs[:, 1]]]
+
+
+"""
+InterferenceReport
+overlaps:      pairs of gears whose solids overlap
+clearance:     {pair: smallest outline distance} of the other pairs
+               that passed the broad phase
+minClearance:  smallest value of clearance, inf when there is none
+candidates:    number of pairs that went to the narrow phase
+Pairs are (id, id) in the order the gears were given.
+"""
+class InterferenceReport:
+    __slots__ = ('overlaps', 'clearance', 'minClearance', 'candidates')
+
+    def __init__(self, overlaps, clearance):
+        self.overlaps = overlaps
+        self.clearance = clearance
+        self.minClearance = min(clearance.values()) if clearance else np.inf
+        self.candidates = len(overlaps) + len(clearance)
+
+    def __bool__(self):
+        return bool(self.overlaps)
+
+
+"""
+findInterference
+Checks a layout of gears: ids, gears (Gear), centres (x, y), phases
+(radians, 0 by default) and rims {id: rim radius} of the internal
+gears (default of rimCircle). Meshing pairs listed in exclude are not
+checked against each other. Pairs whose outer circles come closer
+than margin go to the narrow phase and get their clearance measured.
+Returns an InterferenceReport.
+"""
+def findInterference(ids, gears, centres, phases=None, rims=None, exclude=(), margin=0,
+                     tol=INTERFERENCE_TOL):
+    ids = list(ids)
+    n = len(ids)
+    centres = np.asarray(centres, dtype=float).reshape(-1, 2)
+    phases = np.zeros(n) if phases is None else np.asarray(phases, dtype=float)
+    rims = rims or {}
+    cache = {}
+    solids = []
+    for id, gear in zip(ids, gears):
+        rim = rimCircle(gear, rimRadius=rims.get(id) or 0)[0] if gear.internal else None
+        solids.append(solidOf(gear, rim, tol, cache))
+    outer = np.array([s.outer for s in solids])
+    inner = np.array([s.inner for s in solids])
+    internal = np.array([s.rim is not None for s in solids], dtype=bool)
+
+    pairs = broadPhase(centres, outer, margin)
+    if len(pairs):
+        i, j = pairs.T
+        d = np.hypot(*(centres[i] - centres[j]).T)
+        # gear well inside the hole of a ring does not reach its teeth
+        inHole = (internal[j] & (d + outer[i] + margin < inner[j])) | \
+                 (internal[i] & (d + outer[j] + margin < inner[i]))
+        pairs = pairs[~inHole]
+    index = {id: k for k, id in enumerate(ids)}
+    skip = {tuple(sorted((index[a], index[b]))) for a, b in exclude}
+
+    overlaps = []
+    clearance = {}
+    boundaries = {}
+    for a, b in pairs.tolist():
+        if (a, b) in skip:
+            continue
+        for k in (a, b):
+            if k not in boundaries:
+                boundaries[k] = _boundary(solids[k], centres[k], phases[k], tol*gears[k].module)
+        # only the parts of each outline within reach of the other gear:
+        # the root circles are solid, so when the outer circles meet the
+        # outlines are at most both whole depths (2.25*m) apart
+        reach = margin + 2.25*(gears[a].module + gears[b].module) + tol*max(gears[a].module, gears[b].module)
+        near = {}
+        for k, other in ((a, b), (b, a)):
+            starts, ends = boundaries[k]
+            dist = np.hypot(*(starts - centres[other]).T)
+            mask = dist <= outer[other] + reach
+            if internal[other]:
+                mask &= dist >= inner[other] - reach
+            near[k] = starts[mask], ends[mask]
+        pair = (ids[a], ids[b])
+        if _inside(solids[b], centres[b], phases[b], near[a][0]).any() or \
+           _inside(solids[a], centres[a], phases[a], near[b][0]).any():
+            overlaps.append(pair)
+            continue
+        clearance[pair] = float(min(_pointSegmentDistance(near[a][0], *near[b]),
+                                    _pointSegmentDistance(near[b][0], *near[a])))
+    return InterferenceReport(overlaps, clearance)
+
+
+# Layout of a GearTrain: meshes are excluded, phases default to the
+# solved ones (gear_train.alignPhases)
+#---------------------------------------------------
+def trainInterference(train, phases=None, rims=None, margin=0, tol=INTERFERENCE_TOL):
+    ids = train.order()
+    phases = alignPhases(train) if phases is None else phases
+    exclude = [(id, train.parent(id)) for id in ids if train.parent(id) is not None]
+    return findInterference(ids, [train.gear(id) for id in ids], [train.position(id) for id in ids],
+                            [phases.get(id, 0) for id in ids], rims, exclude, margin, tol)
+
+
+"""
+SegmentGrid
+Fixed radius nearest segment queries, in place of a KD-tree. Segments
+(starts, ends) are entered in every cell their box, grown by `cell`,
+covers and a query only looks at the cell of its point, so the
+distance to the nearest segment is exact when it is below `cell` and
+inf otherwise. query() is vectorized over any number of points.
+"""
+class SegmentGrid:
+    __slots__ = ('starts', 'dirs', 'invLength2', 'cell', 'origin', 'shape', 'table', 'counts')
+
+    def __init__(self, starts, ends, cell):
+        n = len(starts)
+        lo = np.minimum(starts, ends) - cell
+        hi = np.maximum(starts, ends) + cell
+        self.cell = cell
+        self.origin = lo.min(axis=0)
+        i0 = np.floor((lo - self.origin)/cell).astype(np.intp)
+        i1 = np.floor((hi - self.origin)/cell).astype(np.intp)
+        self.shape = (int(i1[:, 0].max()) + 1, int(i1[:, 1].max()) + 1)
+        span = i1 - i0 + 1
+        count = span[:, 0]*span[:, 1]
+        owner = np.repeat(np.arange(n), count)
+        k = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        cid = (i0[owner, 0] + k % span[owner, 0])*self.shape[1] + i0[owner, 1] + k//span[owner, 0]
+        order = np.argsort(cid, kind='stable')
+        cid = cid[order]
+        owner = owner[order]
+        self.counts = np.bincount(cid, minlength=self.shape[0]*self.shape[1])
+        rank = np.arange(len(cid)) - (np.cumsum(self.counts) - self.counts)[cid]
+        # index n is a point far away padding the short cells
+        self.table = np.full((self.shape[0]*self.shape[1], max(int(self.counts.max()), 1)), n, dtype=np.intp)
+        self.table[cid, rank] = owner
+        self.starts = np.concatenate((starts, np.full((1, 2), 1e100)))
+        self.dirs = np.concatenate((ends - starts, np.zeros((1, 2))))
+        length2 = (self.dirs*self.dirs).sum(axis=1)
+        self.invLength2 = np.divide(1, length2, out=np.zeros_like(length2), where=length2 > 0)
+
+    def query(self, pts):
+        """Distance from every point (n, 2) to the nearest segment"""
+        pts = np.asarray(pts, dtype=float).reshape(-1, 2)
+        out = np.full(len(pts), np.inf)
+        ij = np.floor((pts - self.origin)/self.cell).astype(np.intp)
+        ok = (ij[:, 0] >= 0) & (ij[:, 0] < self.shape[0]) & (ij[:, 1] >= 0) & (ij[:, 1] < self.shape[1])
+        index = np.flatnonzero(ok)
+        cids = ij[index, 0]*self.shape[1] + ij[index, 1]
+        # only the points with segments in their cell
+        busy = self.counts[cids] > 0
+        index = index[busy]
+        cids = cids[busy]
+        for i in range(0, len(index), 16384):
+            chunk = index[i:i+16384]
+            cand = self.table[cids[i:i+16384]]
+            d = self.dirs[cand]
+            p = pts[chunk, None, :] - self.starts[cand]
+            t = np.clip(np.einsum('ijk,ijk->ij', p, d)*self.invLength2[cand], 0, 1)
+            q = p - t[..., None]*d
+            dist = np.sqrt(np.einsum('ijk,ijk->ij', q, q).min(axis=1))
+            out[chunk] = np.where(dist < self.cell, dist, np.inf)
+        return out
+
+
+# Mask of the points (gear frame) of a gear centred at centre, phase
+# turning by up to sweep radians, that come within [lo, hi] of other
+# (the whole band is dilated by what a point moves between samples)
+#---------------------------------------------------
+def _sweptBand(pts, centre, phase, sweep, other, lo, hi, samples=32):
+    r = np.hypot(pts[:, 0], pts[:, 1])
+    slack = r.max()*abs(sweep)/samples
+    mask = np.zeros(len(pts), dtype=bool)
+    for t in np.linspace(0, sweep, samples + 1):
+        world = Affine.rotation(phase + t).apply(pts) + centre
+        dist = np.hypot(*(world - other).T)
+        mask |= (dist >= lo - slack) & (dist <= hi + slack)
+    return mask
+
+
+# Points pts (gear frame of a) seen from the frame of gear b, for every
+# turn (ta, tb) of both gears: (steps, n, 2)
+def _toFrame(pts, phaseA, centreA, ta, phaseB, centreB, tb):
+    rot = phaseA + ta - phaseB - tb
+    back = -(phaseB + tb)
+    dx, dy = centreA - centreB
+    c, s = np.cos(rot)[:, None], np.sin(rot)[:, None]
+    cb, sb = np.cos(back)[:, None], np.sin(back)[:, None]
+    x = c*pts[:, 0] - s*pts[:, 1] + (cb*dx - sb*dy)
+    y = s*pts[:, 0] + c*pts[:, 1] + (sb*dx + cb*dy)
+    return np.stack((x, y), axis=2)
+
+
+"""
+MeshClearance
+Clearance of a meshed pair over one mesh cycle (the parent turning one
+tooth pitch):
+turns:         parent rotation of every step (radians)
+clearance:     smallest distance between the two outlines at each step,
+               inf where it is larger than reach
+interference:  True at the steps where the outlines overlap
+minClearance:  smallest clearance of the steps without interference
+worstStep:     step of minClearance
+"""
+class MeshClearance:
+    __slots__ = ('turns', 'clearance', 'interference', 'minClearance', 'worstStep')
+
+    def __init__(self, turns, clearance, interference):
+        self.turns = turns
+        self.clearance = clearance
+        self.interference = interference
+        free = np.where(interference, np.inf, clearance)
+        self.worstStep = int(np.argmin(free))
+        self.minClearance = float(free[self.worstStep])
+
+
+"""
+meshClearance
+Simulates the pair createGearOutline / createIntGearOutline would draw
+for parent (fixed centre) and gear meshed at angle (degrees), at the
+phase of gear_train.meshPhase plus phaseOffset (radians), over `steps`
+positions of one mesh cycle. The driven gear turns zp/z times the
+parent, the other way for external meshes. The standard teeth have no
+backlash: spread (mm) opens the mesh, moving external gears apart and
+internal ones closer together.
+Each step checks the parent's vertices against the gear outline in the
+gear frame and the other way round with a SegmentGrid; the outline
+parts are those that come near the other gear during the cycle.
+Clearances up to reach*module are measured, reach doubles while no
+step finds the other outline.
+rims: rim radii {'parent': r, 'gear': r} of internal gears, tol and
+reach are fractions of the module (see MESH_TOL, MESH_REACH).
+"""
+def meshClearance(parent, gear, angle=0, steps=10000, phaseOffset=0, spread=0, rims=None,
+                  tol=MESH_TOL, reach=MESH_REACH):
+    rims = rims or {}
+    module = max(parent.module, gear.module)
+    solids = []
+    for name, g in (('parent', parent), ('gear', gear)):
+        rim = rimCircle(g, rimRadius=rims.get(name) or 0)[0] if g.internal else None
+        solids.append(GearSolid(g, rim, tol))
+    internal = parent.internal or gear.internal
+    offset = np.array(meshOffset(parent, gear, angle))
+    offset *= 1 + (-spread if internal else spread)/np.hypot(*offset)
+    centres = (np.zeros(2), offset)
+    phases = (0.0, meshPhase(parent, gear, angle) + phaseOffset)
+    ratio = parent.teeth/gear.teeth
+    rotations = np.arange(steps)*parent.pitchAngle/steps
+    rotations = (rotations, rotations*(ratio if internal else -ratio))
+    cell = reach*module
+    while True:
+        # both outlines are within tol of the drawn curves
+        result = _meshSteps(solids, centres, phases, rotations, cell, 2*tol*module)
+        if np.isfinite(result[0]).any() or cell > 4*module:
+            return MeshClearance(rotations[0], *result)
+        cell *= 2
+
+
+# clearance and interference of every step of meshClearance, with
+# SegmentGrid cells of size cell
+def _meshSteps(solids, centres, phases, rotations, cell, depth):
+    steps = len(rotations[0])
+    local = []
+    for k in (0, 1):
+        other = 1 - k
+        pts = solids[k].outline(0)
+        lo, hi = _teethRadii(solids[other])
+        if solids[other].rim is None:
+            lo = 0
+        mask = _sweptBand(pts, centres[k], phases[k], rotations[k][-1], centres[other],
+                          lo - cell, hi + cell)
+        ends = np.roll(pts, -1, axis=0)
+        segs = mask | np.roll(mask, -1)
+        local.append((pts[mask], SegmentGrid(pts[segs], ends[segs], cell)))
+
+    clearance = np.full(steps, np.inf)
+    interference = np.zeros(steps, dtype=bool)
+    for k in (0, 1):
+        other = 1 - k
+        pts = local[k][0]
+        grid = local[other][1]
+        solid = solids[other]
+        # chunks of steps keep the (steps, points) arrays small
+        chunk = max(1, 500000//max(len(pts), 1))
+        for s in range(0, steps, chunk):
+            seen = _toFrame(pts, phases[k], centres[k], rotations[k][s:s+chunk],
+                            phases[other], centres[other], rotations[other][s:s+chunk])
+            n = seen.shape[0]
+            flat = seen.reshape(-1, 2)
+            dist = grid.query(flat).reshape(n, -1).min(axis=1, initial=np.inf)
+            clearance[s:s+n] = np.minimum(clearance[s:s+n], dist)
+            inside = _inside(solid, np.zeros(2), 0, flat, depth).reshape(n, -1).any(axis=1)
+            interference[s:s+n] |= inside
+    return clearance, interference
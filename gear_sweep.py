@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+#-------------------------------------------------------------------------------
+# Name:         Gear Generator
+# Purpose:      Just for fun
+#
+# Author:       Manuel Astros
+# Email:        manuel.astros1980@gmail.com
+# Web:          https://sites.google.com/view/interpolation/home
+#
+# Created:     25/06/2021
+# Copyright:   (c) astros 2021
+# Licence:     MIT
+# Based on:    Gear Drawing with Bézier Curves (https://www.arc.id.au/GearDrawing.html)
+# -------------------------------------------------------------------------------
+#
+# Reelases:
+# 0.1: First Release
+# ______________________________________________________________________________________
+
+# Parameter sweep validation of the tooth generators: runs genGearToothData
+# or genIntGearToothData over a (teeth, pressure angle, module) grid in
+# worker processes and maps which combinations fail, give non finite
+# coordinates or a self intersecting outline.
+#
+#   python gear_sweep.py                 external and internal default ranges
+#   python gear_sweep.py 6 200 14.5 30   teeth and pressure angle ranges
+
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from math import pi
+
+import numpy as np
+
+from gear_calc import genGearToothData, genIntGearToothData, flattenPath, GearPath, Affine
+
+# status codes of the sweep map and their characters in SweepResult.formatMap
+SWEEP_PASS, SWEEP_ERROR, SWEEP_NONFINITE, SWEEP_INTERSECT = range(4)
+SWEEP_CHARS = '.ENX'
+# chord tolerance of the self intersection check, fraction of the module
+SWEEP_FLATTEN_TOL = 0.002
+
+
+#------------------------------------------
+# True when two non adjacent segments of the polyline pts (n, 2) cross,
+# all segment pairs tested at once with orientation signs. Touching
+# within eps (relative to the polyline size) does not count.
+def polylineSelfIntersects(pts, eps=1e-9):
+    a = pts[:-1]
+    d = pts[1:] - a
+    i, j = np.triu_indices(len(a), 2)
+    if len(i) == 0:
+        return False
+    span = np.ptp(pts, axis=0).max()
+    e = eps*span*span
+    def cross(u, v):
+        return u[:, 0]*v[:, 1] - u[:, 1]*v[:, 0]
+    di, dj = d[i], d[j]
+    o1 = cross(di, a[j] - a[i])
+    o2 = cross(di, a[j] + dj - a[i])
+    o3 = cross(dj, a[i] - a[j])
+    o4 = cross(dj, a[i] + di - a[j])
+    hit = (((o1 > e) & (o2 < -e)) | ((o1 < -e) & (o2 > e))) & \
+          (((o3 > e) & (o4 < -e)) | ((o3 < -e) & (o4 > e)))
+    return bool(hit.any())
+
+
+#------------------------------------------
+# The tooth and the next one (rotated one pitch) as one polyline, an
+# undercut flank or a tip running into its neighbour crosses it
+def toothPairIntersects(toothData, z, tol):
+    pts = flattenPath(toothData, tol)
+    nxt = Affine.rotation(2*pi/z).apply(pts)
+    return polylineSelfIntersects(np.concatenate((pts, nxt[1:])))
+
+
+"""
+checkToothData
+Generates one tooth and classifies it: SWEEP_PASS, SWEEP_ERROR (the
+generator raised), SWEEP_NONFINITE (nan / inf coordinates) or
+SWEEP_INTERSECT (self intersecting flanks, see toothPairIntersects).
+Returns (status, message), message is "" unless the generator raised.
+"""
+def checkToothData(m, z, phi, internal=False, profile='bezier', tol=None):
+    gen = genIntGearToothData if internal else genGearToothData
+    try:
+        data = gen(m, z, phi, profile=profile, tol=tol)
+        path = GearPath.fromLegacy(data)
+    except Exception as e:
+        return SWEEP_ERROR, '%s: %s' % (type(e).__name__, e)
+    if not np.isfinite(path.coords).all():
+        return SWEEP_NONFINITE, ''
+    if toothPairIntersects(path, z, SWEEP_FLATTEN_TOL*m):
+        return SWEEP_INTERSECT, ''
+    return SWEEP_PASS, ''
+
+
+# Worker: all the (phi, module) cells of one teeth number. Without tol
+# the outline of module m is the unit one scaled by m, so the verdict
+# does not depend on the module: once one module of a (z, phi) profile
+# passes or intersects, the later modules get the same code without
+# being generated. Only SWEEP_ERROR / SWEEP_NONFINITE cells generate the
+# next module again, their cause may depend on m. With tol the unit
+# flank is built at tol/m, a different one per module, and every module
+# is generated.
+def _sweepRow(job):
+    z, angles, modules, internal, profile, tol = job
+    status = np.zeros((len(angles), len(modules)), dtype=np.uint8)
+    errors = {}
+    regenerate = (None, SWEEP_ERROR, SWEEP_NONFINITE)
+    for a, phi in enumerate(angles):
+        shape = None
+        for k, m in enumerate(modules):
+            if tol is not None or shape in regenerate:
+                code, msg = checkToothData(m, z, phi, internal, profile, tol)
+                shape = code
+            else:
+                code, msg = shape, ''
+            status[a, k] = code
+            if msg:
+                errors[(z, phi, m)] = msg
+    return status, errors
+
+
+"""
+SweepResult
+Outcome of sweepToothData. status is a uint8 array (teeth, angles,
+modules) of SWEEP_* codes, errors maps (z, phi, m) to the exception
+message of every SWEEP_ERROR cell.
+"""
+class SweepResult:
+    __slots__ = ('teeth', 'angles', 'modules', 'internal', 'status', 'errors')
+
+    def __init__(self, teeth, angles, modules, internal, status, errors):
+        self.teeth = teeth
+        self.angles = angles
+        self.modules = modules
+        self.internal = internal
+        self.status = status
+        self.errors = errors
+
+    def passed(self):
+        return self.status == SWEEP_PASS
+
+    def allPassed(self):
+        return bool(self.passed().all())
+
+    def counts(self):
+        return {c: int((self.status == code).sum()) for code, c in enumerate(SWEEP_CHARS)}
+
+    def failures(self):
+        """(z, phi, m, status, message) of every cell that did not pass"""
+        out = []
+        for i, a, k in zip(*np.nonzero(self.status != SWEEP_PASS)):
+            z, phi, m = self.teeth[i], self.angles[a], self.modules[k]
+            out.append((z, phi, m, int(self.status[i, a, k]), self.errors.get((z, phi, m), '')))
+        return out
+
+    def formatMap(self, module=0):
+        """Text map of one module index, a row per teeth number and a
+        column per pressure angle, cells drawn with SWEEP_CHARS"""
+        lines = ['%s gear, module %g' % ('internal' if self.internal else 'external',
+                                         self.modules[module]),
+                 '   z  phi %g .. %g' % (self.angles[0], self.angles[-1])]
+        chars = np.array(list(SWEEP_CHARS))
+        for i, z in enumerate(self.teeth):
+            lines.append('%4d  %s' % (z, ''.join(chars[self.status[i, :, module]])))
+        return '\n'.join(lines)
+
+
+"""
+sweepToothData
+Validates the tooth generator over every combination of teeth, angles
+(pressure angle in degrees) and modules. Teeth numbers are shared out
+to `workers` processes (None: one per CPU, 1: run here), profile and
+tol are passed to the generator. Returns a SweepResult.
+"""
+def sweepToothData(teeth, angles, modules=(1,), internal=False, profile='bezier', tol=None,
+                   workers=None):
+    teeth = [int(z) for z in teeth]
+    angles = [float(phi) for phi in angles]
+    modules = [float(m) for m in modules]
+    jobs = [(z, angles, modules, internal, profile, tol) for z in teeth]
+    if workers == 1:
+        rows = list(map(_sweepRow, jobs))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            rows = list(pool.map(_sweepRow, jobs, chunksize=max(1, len(jobs)//64)))
+    status = np.empty((len(teeth), len(angles), len(modules)), dtype=np.uint8)
+    errors = {}
+    for i, (row, rowErrors) in enumerate(rows):
+        status[i] = row
+        errors.update(rowErrors)
+    return SweepResult(teeth, angles, modules, internal, status, errors)
+
+
+if __name__ == '__main__':
+    args = [float(a) for a in sys.argv[1:5]]
+    zMin, zMax, phiMin, phiMax = args + [6, 150, 14.5, 30][len(args):]
+    teeth = range(int(zMin), int(zMax) + 1)
+    angles = np.arange(phiMin, phiMax + 1e-9, 0.5)
+    for internal in (False, True):
+        result = sweepToothData(teeth, angles, (0.5, 1, 2.5), internal)
+        print(result.formatMap())
+        print(result.counts())
+        for z, phi, m, code, msg in result.failures():
+            if code == SWEEP_ERROR:
+                print('  z=%d phi=%g m=%g %s' % (z, phi, m, msg))
@@ -19,9 +19,14 @@
 # ______________________________________________________________________________________
 
 """Generate xml format for gear data"""
+import hashlib
+import io
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
-from random import seed, random
+from itertools import chain, count, islice
+
+import numpy as np
+
+from gear_calc import arcCubics
 # from gear_calc import createGearOutline
 
 # axes position in vectors
@@ -29,27 +34,364 @@ x = 0
 y = 1
 # ----------------------
 
+# bytes kept by SynfigWriter before writing them out
+WRITER_BUFFER = 1 << 16
+
+
+def _escapeText(text):
+    """Escape element text as ElementTree does"""
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def _escapeAttrib(text):
+    """Escape an attribute value as ElementTree does"""
+    text = _escapeText(text)
+    if '"' in text:
+        text = text.replace('"', '&quot;')
+    if '\r' in text:
+        text = text.replace('\r', '&#13;')
+    if '\n' in text:
+        text = text.replace('\n', '&#10;')
+    if '\t' in text:
+        text = text.replace('\t', '&#09;')
+    return text
+
+
+"""
+SynfigWriter
+Streaming xml writer: elements go to out (a binary file or buffer) as
+they are written, only the open elements and WRITER_BUFFER bytes are
+kept. Without indent the bytes are the ones of ET.tostring for the same
+tree (us-ascii, character references); indent ('  ' for instance) lays
+the written elements out as ET.indent does.
+start(tag, attrib) / end():   element with children
+leaf(tag, attrib, text):      element without children
+raw(text):                    markup already serialized, one child
+element(elem):                an ElementTree element as it is
+openTree(root):               an ElementTree root left open, the next
+                              elements are appended to it
+"""
+class SynfigWriter:
+    __slots__ = ('out', 'indent', '_stack', '_filled', '_pending', '_chunks', '_size')
+
+    def __init__(self, out, indent=None):
+        self.out = out
+        self.indent = indent
+        # closing tags of the open elements, and whether they have children
+        self._stack = []
+        self._filled = []
+        # start tag of the innermost element not closed with ">" yet
+        self._pending = False
+        self._chunks = []
+        self._size = 0
+
+    def _put(self, text):
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._size >= WRITER_BUFFER:
+            self.flush()
+
+    def _child(self):
+        """Prepare the innermost open element to get a child"""
+        if not self._stack:
+            return
+        if self._pending:
+            self._put('>')
+            self._pending = False
+        self._filled[-1] = True
+        if self.indent:
+            self._put('\n' + self.indent*len(self._stack))
+
+    def start(self, tag, attrib=None):
+        self._child()
+        self._put('<' + tag + _attribText(attrib))
+        self._stack.append('</' + tag + '>')
+        self._filled.append(False)
+        self._pending = True
+
+    def leaf(self, tag, attrib=None, text=None):
+        self._child()
+        if text:
+            self._put('<%s%s>%s</%s>' % (tag, _attribText(attrib), _escapeText(text), tag))
+        else:
+            self._put('<' + tag + _attribText(attrib) + ' />')
+
+    def end(self):
+        closing = self._stack.pop()
+        filled = self._filled.pop()
+        if self._pending:
+            self._put(' />')
+            self._pending = False
+            return
+        if self.indent and filled:
+            self._put('\n' + self.indent*len(self._stack))
+        self._put(closing)
+
+    def raw(self, text):
+        self._child()
+        self._put(text)
+
+    def element(self, elem):
+        self._child()
+        self._put(ET.tostring(elem, encoding='unicode'))
+
+    def openTree(self, root):
+        tail = root.tail
+        root.tail = None
+        try:
+            text = ET.tostring(root, encoding='unicode')
+        finally:
+            root.tail = tail
+        if text.endswith(' />'):
+            text = text[:-3]
+            closing = '</%s>' % text[1:].split(None, 1)[0]
+            filled = False
+        else:
+            cut = text.rindex('</')
+            text, closing = text[:cut], text[cut:]
+            filled = True
+        self._child()
+        self._put(text if filled else text + '>')
+        self._stack.append(closing)
+        self._filled.append(filled)
+
+    def flush(self):
+        if self._chunks:
+            self.out.write(''.join(self._chunks).encode('us-ascii', 'xmlcharrefreplace'))
+            self._chunks = []
+            self._size = 0
+
+    def close(self):
+        """End the open elements and write everything out"""
+        while self._stack:
+            self.end()
+        self.flush()
+
+
+def _attribText(attrib):
+    if not attrib:
+        return ''
+    return ''.join(' %s="%s"' % (k, _escapeAttrib(v)) for k, v in attrib.items())
+
+
 def synfigFormat(xmlR):
     """Return a xml format as required in synfig for the Element"""
-    rough_string = ET.tostring(xmlR, 'utf-8')
-    reparsed = minidom.parseString(rough_string)
-    return reparsed.toprettyxml(indent="  ")
+    buffer = io.BytesIO()
+    writer = SynfigWriter(buffer, indent='  ')
+    writer._put('<?xml version="1.0" ?>\n')
+    _writeTree(writer, xmlR)
+    writer.close()
+    return buffer.getvalue().decode('us-ascii') + '\n'
+
+
+def _writeTree(writer, elem):
+    """elem and its subtree through writer, indented by it"""
+    if len(elem) == 0:
+        writer.leaf(elem.tag, elem.attrib, elem.text)
+        return
+    writer.start(elem.tag, elem.attrib)
+    for child in elem:
+        _writeTree(writer, child)
+    writer.end()
+
+
+"""
+GuidSequence
+Deterministic guids for the bline points of one document, 32 hex
+digits: 16 from a hash of params (the gear parameters, any values with
+a stable repr) and a 16 digit counter from start. Calling it returns
+the next guid. The same gear written twice gives the same bytes; use
+one sequence per document, or start past the guids a document already
+holds, to keep them unique.
+"""
+class GuidSequence:
+    __slots__ = ('prefix', '_format', '_next')
+
+    def __init__(self, *params, start=0):
+        digest = hashlib.blake2b(repr(params).encode('utf-8'), digest_size=8)
+        self.prefix = digest.hexdigest().upper()
+        self._format = self.prefix + '%016X'
+        self._next = count(start).__next__
+
+    def __call__(self):
+        return self._format % self._next()
+
+
+# leading outline items hashed into a default guid seed, they hold the
+# first flank so they differ with module, teeth, pressure angle, internal
+SEED_ITEMS = 16
+
+
+def _seedGuids(gearData, *names):
+    """default GuidSequence of an outline from names and its first
+    SEED_ITEMS items, and an iterator over all of gearData"""
+    items = iter(gearData)
+    head = tuple(islice(items, SEED_ITEMS))
+    return GuidSequence(*names, head), chain(head, items)
+
+
+# largest distance (synfig units) between an "A" arc and its cubics
+ARC_TOL = 1e-4
+# vertices converted per numpy call
+VERTEX_BATCH = 256
+# formats of the vertex values x, y, t1 radius, t1 theta, t2 radius,
+# t2 theta, the decimals synfig writes reals and angles with
+VERTEX_FORMATS = ('%.10f', '%.10f', '%.10f', '%.6f', '%.10f', '%.6f')
 
 
-def guidGenerator(id):
-    """generate id for guid"""
-    randId = str(random())
-    guidNumber = 'A' + randId[2:]
-    L = len(guidNumber)
+"""
+blineVertices
+Synfig vertices of an outline in list format, up to its end or its "R"
+record, as (x, y, t1 x, t1 y, t2 x, t2 y) floats; polarVertices turns
+the tangents into the radius and theta synfig stores.
+t1 is the tangent arriving at the vertex and t2 the one leaving it;
+synfig draws the segment from a to b as the cubic with control points
+a + a.t2/3 and b - b.t1/3. So every "C" section is one vertex with the
+tangents of its control points ("Q" sections are raised to cubics),
+"A" arcs are split in the fewest cubics within arcTol (arcCubics, a
+single one for the short tip and root arcs) and "L" end points are
+corners with zero tangents. The first vertex is written last, once the
+tangent closing the loop is known; a last point on top of it is merged
+into it.
+"""
+def blineVertices(gearData, arcTol=ARC_TOL):
+    zero = (0.0, 0.0)
+    first = None
+    # vertex waiting for its leaving tangent: x, y, t1 x, t1 y
+    prev = None
+    cmd = None
+    items = iter(gearData)
+    for item in items:
+        if type(item) is not list:
+            if isinstance(item, str):
+                if item == 'R':
+                    break
+                cmd = item
+            elif cmd == 'A' and prev is not None:
+                # arc radii, rotation and flags, then its end point
+                r = item
+                next(items)
+                next(items)
+                large = next(items)
+                sweep = next(items)
+                start = prev
+                for c1, c2, p in arcCubics(prev, next(items), r, large, sweep, arcTol):
+                    t2 = (3*(c1[x] - start[x]), 3*(c1[y] - start[y]))
+                    if first is None:
+                        first = (prev[0], prev[1]) + t2
+                    else:
+                        yield prev + t2
+                    prev = (p[x], p[y], 3*(p[x] - c2[x]), 3*(p[y] - c2[y]))
+                    start = p
+            continue
+        if cmd == 'C':
+            c2 = next(items)
+            p = next(items)
+            t2 = (3*(item[x] - prev[0]), 3*(item[y] - prev[1]))
+            t1 = (3*(p[x] - c2[x]), 3*(p[y] - c2[y]))
+        elif cmd == 'Q':
+            p = next(items)
+            t2 = (2*(item[x] - prev[0]), 2*(item[y] - prev[1]))
+            t1 = (2*(p[x] - item[x]), 2*(p[y] - item[y]))
+        else:
+            p = item
+            t2 = t1 = zero
+        if prev is None:
+            pass
+        elif first is None:
+            first = (prev[0], prev[1]) + t2
+        else:
+            yield prev + t2
+        prev = (p[x], p[y]) + t1
+    if prev is None:
+        return
+    if first is None:
+        yield prev + zero
+        return
+    scale = 1e-9*(1 + abs(first[0]) + abs(first[1]))
+    if abs(prev[0] - first[0]) > scale or abs(prev[1] - first[1]) > scale:
+        # straight closing segment
+        yield prev + zero
+        prev = (first[0], first[1]) + zero
+    yield (first[0], first[1], prev[2], prev[3], first[2], first[3])
 
-    for j in range(31 - L - len(str(id))):
-        guidNumber += '0'
-    guidNumber += 'A' + str(id)
-    return guidNumber
 
+def circleVertices(gearData):
+    """Vertices of the shaft / rim rows [x, y, tangent, angle] of gearData,
+    with polar tangents"""
+    for row in gearData:
+        if isinstance(row, list):
+            yield (row[0], row[1], row[2], row[3], row[2], row[3])
 
-def xml_support(canvasG, gearData, layer_desc='Gear Outline', rLocation=0):
-    """"xml support"""
+
+def polarVertices(vertices, batch=VERTEX_BATCH):
+    """
+    blineVertices tuples with the tangents as radius and theta (degrees,
+    0 for a zero tangent), converted with numpy batch vertices at a time
+    """
+    vertices = iter(vertices)
+    while True:
+        rows = list(islice(vertices, batch))
+        if not rows:
+            return
+        v = np.array(rows, dtype=float)
+        tx = v[:, 2::2].copy()
+        ty = v[:, 3::2]
+        radius = np.hypot(tx, ty)
+        v[:, 3::2] = np.where(radius == 0, 0, np.degrees(np.arctan2(ty, tx)))
+        v[:, 2::2] = radius
+        yield from v.tolist()
+
+
+def vertexText(vertex):
+    """strings of the values of a polar vertex (VERTEX_FORMATS)"""
+    return tuple(f % value for f, value in zip(VERTEX_FORMATS, vertex))
+
+
+def _tangentElement(compositeSub, tag, radius, theta):
+    t = ET.SubElement(compositeSub, tag)
+    radial_composite = ET.SubElement(t, 'radial_composite', {'type' : 'vector'})
+    radiusSub = ET.SubElement(radial_composite, 'radius')
+    ET.SubElement(radiusSub, 'real', {'value' : radius})
+    thetaSub = ET.SubElement(radial_composite, 'theta')
+    ET.SubElement(thetaSub, 'angle', {'value' : theta})
+
+
+def blinePoint(bline, guid, px, py, radius1, theta1, radius2, theta2):
+    """bline entry element of one vertex"""
+    entry = ET.SubElement(bline, 'entry')
+    compositeSub = ET.SubElement(entry, 'composite', {'guid' : guid, 'type' : 'bline_point'})
+    point = ET.SubElement(compositeSub, 'point')
+    vectorSub = ET.SubElement(point, 'vector')
+    xxSub = ET.SubElement(vectorSub, 'x')
+    xxSub.text = px
+    yySub = ET.SubElement(vectorSub, 'y')
+    yySub.text = py
+    width = ET.SubElement(compositeSub, 'width')
+    ET.SubElement(width,'real', {'value' : '1.0000000000'})
+    origin = ET.SubElement(compositeSub, 'origin')
+    ET.SubElement(origin,'real', {'value' : '0.5000000000'})
+    split = ET.SubElement(compositeSub, 'split')
+    ET.SubElement(split,'bool', {'value' : 'false'})
+    _tangentElement(compositeSub, 't1', radius1, theta1)
+    _tangentElement(compositeSub, 't2', radius2, theta2)
+    split_radius = ET.SubElement(compositeSub, 'split_radius')
+    ET.SubElement(split_radius, 'bool', {'value' : 'true'})
+    split_angle = ET.SubElement(compositeSub, 'split_angle')
+    ET.SubElement(split_angle, 'bool', {'value' : 'true'})
+    return entry
+
+
+def xml_support(canvasG, gearData, layer_desc='Gear Outline', rLocation=0, guids=None):
+    """"xml support, guids: GuidSequence of the document"""
+    if guids is None:
+        guids, _ = _seedGuids(gearData, layer_desc)
 
     layer = ET.SubElement(canvasG, 'layer', {'type' : 'outline',
                                             'active' : 'true',
@@ -93,75 +435,11 @@ def xml_support(canvasG, gearData, layer_desc='Gear Outline', rLocation=0):
     paramSub = ET.SubElement(layer,'param', {'name' : 'bline'})
     bline = ET.SubElement(paramSub,'bline', {'type' : 'bline_point', 'loop' : 'true'})
     if rLocation == 0:
-        for i in range(len(gearData)):
-            if isinstance(gearData[i], list):
-                guid = guidGenerator(i)
-                entry = ET.SubElement(bline, 'entry')
-                compositeSub = ET.SubElement(entry, 'composite', {'guid' : guid, 'type' : 'bline_point'})
-                point = ET.SubElement(compositeSub, 'point')
-                vectorSub = ET.SubElement(point, 'vector')
-                xxSub = ET.SubElement(vectorSub, 'x')
-                xxSub.text = str(gearData[i][x])
-                yySub = ET.SubElement(vectorSub, 'y')
-                yySub.text = str(gearData[i][y])
-                width = ET.SubElement(compositeSub, 'width')
-                ET.SubElement(width,'real', {'value' : '1.0000000000'})
-                origin = ET.SubElement(compositeSub, 'origin')
-                ET.SubElement(origin,'real', {'value' : '0.5000000000'})
-                split = ET.SubElement(compositeSub, 'split')
-                ET.SubElement(split,'bool', {'value' : 'false'})
-                t1 = ET.SubElement(compositeSub, 't1')
-                radial_composite = ET.SubElement(t1, 'radial_composite', {'type' : 'vector'})
-                radius = ET.SubElement(radial_composite, 'radius')
-                ET.SubElement(radius, 'real', {'value' : '0.0000000000'})
-                theta = ET.SubElement(radial_composite, 'theta')
-                ET.SubElement(theta, 'angle', {'value' : '0.000000'})
-                t2 = ET.SubElement(compositeSub, 't2')
-                radial_composite = ET.SubElement(t2, 'radial_composite', {'type' : 'vector'})
-                radius = ET.SubElement(radial_composite, 'radius')
-                ET.SubElement(radius, 'real', {'value' : '0.0000000000'})
-                theta = ET.SubElement(radial_composite, 'theta')
-                ET.SubElement(theta, 'angle', {'value' : '0.000000'})
-                split_radius = ET.SubElement(compositeSub, 'split_radius')
-                ET.SubElement(split_radius, 'bool', {'value' : 'true'})
-                split_angle = ET.SubElement(compositeSub, 'split_angle')
-                ET.SubElement(split_angle, 'bool', {'value' : 'true'})
-            elif gearData[i] == 'A':
-                pass
+        vertices = polarVertices(blineVertices(gearData))
     else:
-        for i in range(len(gearData)):
-            if isinstance(gearData[i], list):
-                guid = guidGenerator(rLocation + 2 + i)
-                entry = ET.SubElement(bline, 'entry')
-                compositeSub02 = ET.SubElement(entry, 'composite', {'guid': guid, 'type': 'bline_point'})
-                point = ET.SubElement(compositeSub02, 'point')
-                vectorSub02 = ET.SubElement(point, 'vector')
-                xxSub02 = ET.SubElement(vectorSub02, 'x')
-                xxSub02.text = str(gearData[i][0])
-                yySub02 = ET.SubElement(vectorSub02, 'y')
-                yySub02.text = str(gearData[i][1])
-                width = ET.SubElement(compositeSub02, 'width')
-                ET.SubElement(width, 'real', {'value': '1.0000000000'})
-                origin = ET.SubElement(compositeSub02, 'origin')
-                ET.SubElement(origin, 'real', {'value': '0.5000000000'})
-                split = ET.SubElement(compositeSub02, 'split')
-                ET.SubElement(split, 'bool', {'value': 'false'})
-                t1 = ET.SubElement(compositeSub02, 't1')
-                radial_composite = ET.SubElement(t1, 'radial_composite', {'type': 'vector'})
-                radius = ET.SubElement(radial_composite, 'radius')
-                ET.SubElement(radius, 'real', {'value': str(gearData[i][2])})
-                theta = ET.SubElement(radial_composite, 'theta')
-                ET.SubElement(theta, 'angle', {'value': str(gearData[i][3])})
-                t2 = ET.SubElement(compositeSub02, 't2')
-                radial_composite = ET.SubElement(t2, 'radial_composite', {'type': 'vector'})
-                radius = ET.SubElement(radial_composite, 'radius')
-                ET.SubElement(radius, 'real', {'value': str(gearData[i][2])})
-                theta = ET.SubElement(radial_composite, 'theta')
-                ET.SubElement(theta, 'angle', {'value': str(gearData[i][3])})
-                split_radius = ET.SubElement(compositeSub02, 'split_radius')
-                ET.SubElement(split_radius, 'bool', {'value': 'true'})
-                split_angle = ET.SubElement(compositeSub02, 'split_angle')
-                ET.SubElement(split_angle, 'bool', {'value': 'true'})
+        vertices = circleVertices(gearData)
+    for vertex in vertices:
+        blinePoint(bline, guids(), *vertexText(vertex))
 
     paramSub = ET.SubElement(layer,'param', {'name' : 'width'})
     ET.SubElement(paramSub, 'real', {'value' : '0.0472440959'})
@@ -182,8 +460,12 @@ def xml_support(canvasG, gearData, layer_desc='Gear Outline', rLocation=0):
 
 
 
-def g_to_xml(gearData, group_name, shaft_or_outline=None):
-    """function to create xml format for gear data"""
+def g_to_xml(gearData, group_name, shaft_or_outline=None, guids=None):
+    """function to create xml format for gear data, guids: GuidSequence
+    of the document, by default one hashed from the names and the start
+    of the outline"""
+    if guids is None:
+        guids, _ = _seedGuids(gearData, group_name, shaft_or_outline)
     rLoc = gearData.index('R')
     canvasG = ET.Element('canvas')
     layerG = ET.SubElement(canvasG, 'layer', {'type' : 'group',
@@ -227,9 +509,9 @@ def g_to_xml(gearData, group_name, shaft_or_outline=None):
     param = ET.SubElement(layerG,'param', {'name' : 'canvas'})
     canvas = ET.SubElement(param,'canvas')
 
-    xml_support(canvas, gearData[:rLoc])
+    xml_support(canvas, gearData[:rLoc], guids=guids)
     if shaft_or_outline != None and gearData[rLoc + 1] != 0:
-        xml_support(canvas, gearData[rLoc:], shaft_or_outline, rLoc)
+        xml_support(canvas, gearData[rLoc:], shaft_or_outline, rLoc, guids)
 
     param = ET.SubElement(layerG,'param', {'name' : 'time_dilation'})
     ET.SubElement(param,'real', {'value' : '1.0000000000'})
@@ -248,10 +530,208 @@ def g_to_xml(gearData, group_name, shaft_or_outline=None):
     param = ET.SubElement(layerG,'param', {'name' : 'z_range_blur'})
     ET.SubElement(param,'real', {'value' : '0.0000000000'})
 
-    xml_gear = synfigFormat(layerG)
     return layerG
 
 
+# ----------------------- streaming -------------------------------
+
+def _writeValue(writer, wrapper, tag, attrib):
+    """wrapper element holding one value element"""
+    writer.start(wrapper)
+    writer.leaf(tag, attrib)
+    writer.end()
+
+
+def _writeParam(writer, name, tag, attrib):
+    """param holding one value element"""
+    writer.start('param', {'name': name})
+    writer.leaf(tag, attrib)
+    writer.end()
+
+
+def _writeVector(writer, vx, vy):
+    writer.start('vector')
+    writer.leaf('x', text=vx)
+    writer.leaf('y', text=vy)
+    writer.end()
+
+
+def _writeOutlineHead(writer, layer_desc):
+    """outline layer up to the open bline, as xml_support"""
+    writer.start('layer', {'type': 'outline',
+                           'active': 'true',
+                           'exclude_from_rendering': 'false',
+                           'version': '0.3',
+                           'desc': layer_desc})
+    _writeParam(writer, 'z_depth', 'real', {'value': '0.0000000000'})
+    _writeParam(writer, 'amount', 'real', {'value': '1.0000000000'})
+    _writeParam(writer, 'blend_method', 'integer', {'value': '0'})
+    writer.start('param', {'name': 'color'})
+    writer.start('color')
+    writer.leaf('r', text='0.223529')
+    writer.leaf('g', text='0.129412')
+    writer.leaf('b', text='0.180392')
+    writer.leaf('a', text='1.000000')
+    writer.end()
+    writer.end()
+    writer.start('param', {'name': 'origin'})
+    _writeVector(writer, '0.0000000000', '0.0000000000')
+    writer.end()
+    _writeParam(writer, 'invert', 'bool', {'value': 'false'})
+    _writeParam(writer, 'antialias', 'bool', {'value': 'true'})
+    _writeParam(writer, 'feather', 'real', {'value': '0.0000000000'})
+    _writeParam(writer, 'blurtype', 'integer', {'value': '1'})
+    _writeParam(writer, 'winding_style', 'integer', {'value': '0'})
+    writer.start('param', {'name': 'bline'})
+    writer.start('bline', {'type': 'bline_point', 'loop': 'true'})
+
+
+def _writeOutlineTail(writer):
+    """close the bline and write the remaining outline params"""
+    writer.end()
+    writer.end()
+    _writeParam(writer, 'width', 'real', {'value': '0.0472440959'})
+    _writeParam(writer, 'expand', 'real', {'value': '0.0000000000'})
+    _writeParam(writer, 'sharp_cusps', 'bool', {'value': 'true'})
+    _writeParam(writer, 'round_tip[0]', 'bool', {'value': 'true'})
+    _writeParam(writer, 'round_tip[1]', 'bool', {'value': 'true'})
+    _writeParam(writer, 'homogeneous_width', 'bool', {'value': 'true'})
+    writer.end()
+
+
+def _writeTangent(writer, tag, radius, theta):
+    writer.start(tag)
+    writer.start('radial_composite', {'type': 'vector'})
+    _writeValue(writer, 'radius', 'real', {'value': radius})
+    _writeValue(writer, 'theta', 'angle', {'value': theta})
+    writer.end()
+    writer.end()
+
+
+def _writeBlinePoint(writer, guid, px, py, radius1, theta1, radius2, theta2):
+    """one bline entry, same elements as blinePoint"""
+    writer.start('entry')
+    writer.start('composite', {'guid': guid, 'type': 'bline_point'})
+    writer.start('point')
+    _writeVector(writer, px, py)
+    writer.end()
+    _writeValue(writer, 'width', 'real', {'value': '1.0000000000'})
+    _writeValue(writer, 'origin', 'real', {'value': '0.5000000000'})
+    _writeValue(writer, 'split', 'bool', {'value': 'false'})
+    _writeTangent(writer, 't1', radius1, theta1)
+    _writeTangent(writer, 't2', radius2, theta2)
+    _writeValue(writer, 'split_radius', 'bool', {'value': 'true'})
+    _writeValue(writer, 'split_angle', 'bool', {'value': 'true'})
+    writer.end()
+    writer.end()
+
+
+# precompiled bline entries, (indent, depth): template
+_BLINE_TEMPLATES = {}
+
+
+def _blinePointTemplate(indent, depth):
+    """
+    %-template of the entry _writeBlinePoint writes with depth elements
+    open, taking the guid and a polar vertex (VERTEX_FORMATS). Compiled
+    once by running _writeBlinePoint on placeholders, so both give the
+    same bytes.
+    """
+    key = (indent, depth)
+    template = _BLINE_TEMPLATES.get(key)
+    if template is None:
+        buffer = io.BytesIO()
+        writer = SynfigWriter(buffer, indent)
+        writer._stack = [''] * depth
+        writer._filled = [True] * depth
+        _writeBlinePoint(writer, '%s', *VERTEX_FORMATS)
+        writer.flush()
+        template = buffer.getvalue().decode('us-ascii')
+        # the line break before the entry is written by writer.raw
+        if indent:
+            template = template[1 + len(indent)*depth:]
+        _BLINE_TEMPLATES[key] = template
+    return template
+
+
+def writeBlinePoints(writer, vertices, guids):
+    """
+    bline entries of vertices (polarVertices or circleVertices tuples) as
+    children of the element open in writer, one filled template per vertex
+    and VERTEX_BATCH entries per write
+    """
+    template = _blinePointTemplate(writer.indent, len(writer._stack))
+    # what writer.raw puts between two children
+    sep = '\n' + writer.indent*len(writer._stack) if writer.indent else ''
+    vertices = iter(vertices)
+    while True:
+        batch = [template % (guids(), *vertex) for vertex in islice(vertices, VERTEX_BATCH)]
+        if not batch:
+            return
+        writer.raw(sep.join(batch))
+
+
+def writeGear(writer, gearData, group_name, shaft_or_outline=None, guids=None):
+    """
+    Stream the group layer of g_to_xml through a SynfigWriter. gearData
+    is the outline in list format or any iterable of its items, e.g.
+    itertools.chain.from_iterable(streamGearOutline(...)), read once:
+    vertices are written in batches of VERTEX_BATCH as soon as their
+    tangents are known (see blineVertices). guids as in g_to_xml.
+    """
+    items = iter(gearData)
+    if guids is None:
+        guids, items = _seedGuids(items, group_name, shaft_or_outline)
+    writer.start('layer', {'type': 'group',
+                           'active': 'true',
+                           'exclude_from_rendering': 'false',
+                           'version': '0.3',
+                           'desc': group_name})
+    _writeParam(writer, 'z_depth', 'real', {'value': '0.0000000000'})
+    _writeParam(writer, 'amount', 'real', {'value': '1.0000000000'})
+    _writeParam(writer, 'blend_method', 'integer', {'value': '0', 'static': 'true'})
+    writer.start('param', {'name': 'origin'})
+    _writeVector(writer, '0.0000000000', '0.0000000000')
+    writer.end()
+    writer.start('param', {'name': 'transformation'})
+    writer.start('composite', {'type': 'transformation'})
+    writer.start('offset')
+    _writeVector(writer, '0.0000000000', '0.0000000000')
+    writer.end()
+    _writeValue(writer, 'angle', 'angle', {'value': '0.000000'})
+    _writeValue(writer, 'skew_angle', 'angle', {'value': '0.000000'})
+    writer.start('scale')
+    _writeVector(writer, '1.0000000000', '1.0000000000')
+    writer.end()
+    writer.end()
+    writer.end()
+    writer.start('param', {'name': 'canvas'})
+    writer.start('canvas')
+
+    # gear outline up to the shaft / rim record "R"
+    _writeOutlineHead(writer, 'Gear Outline')
+    writeBlinePoints(writer, polarVertices(blineVertices(items)), guids)
+    _writeOutlineTail(writer)
+    r = next(items, None)
+    if r is not None and r != 0 and shaft_or_outline != None:
+        # rows [x, y, tangent, angle] after "R", r
+        _writeOutlineHead(writer, shaft_or_outline)
+        writeBlinePoints(writer, circleVertices(items), guids)
+        _writeOutlineTail(writer)
+
+    writer.end()
+    writer.end()
+    _writeParam(writer, 'time_dilation', 'real', {'value': '1.0000000000'})
+    _writeParam(writer, 'time_offset', 'time', {'value': '0s'})
+    _writeParam(writer, 'children_lock', 'bool', {'value': 'false'})
+    _writeParam(writer, 'outline_grow', 'real', {'value': '0.0000000000'})
+    _writeParam(writer, 'z_range', 'bool', {'value': 'false', 'static': 'true'})
+    _writeParam(writer, 'z_range_position', 'real', {'value': '0.0000000000'})
+    _writeParam(writer, 'z_range_depth', 'real', {'value': '0.0000000000'})
+    _writeParam(writer, 'z_range_blur', 'real', {'value': '0.0000000000'})
+    writer.end()
+
+
 
 # -----------------------Pueba-------------------------------------
 
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+
+#-------------------------------------------------------------------------------
+# Name:         Gear Generator
+# Purpose:      Just for fun
+#
+# Author:       Manuel Astros
+# Email:        manuel.astros1980@gmail.com
+# Web:          https://sites.google.com/view/interpolation/home
+#
+# Created:     25/06/2021
+# Copyright:   (c) astros 2021
+# Licence:     MIT
+# Based on:    Gear Drawing with Bézier Curves (https://www.arc.id.au/GearDrawing.html)
+# -------------------------------------------------------------------------------
+#
+# Reelases:
+# 0.1: First Release
+# ______________________________________________________________________________________
+
+# Gear train model: gears are the nodes, meshes the edges. Every gear is
+# either a root placed at a given point or driven by one parent gear,
+# meshed at an angle (degrees) around it. Positions are propagated from
+# the roots in topological order and only the subtree below a change is
+# recomputed.
+
+from collections import deque
+from math import cos, sin, radians, pi
+
+import numpy as np
+
+
+class GearTrainError(ValueError):
+    pass
+
+
+"""
+meshOffset
+Centre of gear relative to the centre of parent when they mesh at
+angle (degrees), same rules as the GUI mesh placement:
+external - external: pitch circles touch outside, at the mesh angle
+internal parent:     the gear rolls inside the ring
+internal gear:       the ring goes around the parent
+Two internal gears, or a ring not larger than the gear inside it, can
+not mesh and raise GearTrainError.
+"""
+def meshOffset(parent, gear, angle):
+    Rparent = parent.Rpitch
+    R = gear.Rpitch
+    if parent.internal and gear.internal:
+        raise GearTrainError('two internal gears can not mesh')
+    if parent.internal or gear.internal:
+        if (parent.internal and Rparent <= R) or (gear.internal and R <= Rparent):
+            raise GearTrainError('the internal gear must be larger than the one inside it')
+        dist = -(Rparent - R)
+    else:
+        dist = Rparent + R
+    a = radians(angle)
+    return dist*cos(a), dist*sin(a)
+
+
+"""
+meshPhaseTerms
+Rotation phase (radians) of a driven gear as c + k*parentPhase, for
+parent and driven tooth counts zp, z, mesh angle (degrees) and whether
+the mesh is internal. A phase p puts the tooth centres at p + 2*pi*i/z
+(the tooth generators centre the first tooth on angle 0). At the pitch
+point the driven gear must show a space where the parent shows a
+tooth, and the pitch circles roll without slip:
+external: contact at A on the parent, A + pi on the gear, opposite
+          rolling, phase = A + pi + (A - parentPhase)*zp/z - pi/z
+internal: contact at A + pi on both (see meshOffset), same rolling,
+          phase = Ac - (Ac - parentPhase)*zp/z - pi/z
+Works on scalars or numpy arrays.
+"""
+def meshPhaseTerms(zp, z, angle, internal):
+    a = np.radians(angle)
+    ratio = np.divide(zp, z)
+    contact = a + pi
+    c = np.where(internal, contact*(1 - ratio), contact + a*ratio) - pi/np.asarray(z)
+    k = np.where(internal, ratio, -ratio)
+    return c, k
+
+
+# Phase of gear meshed with parent (phase parentPhase) at angle,
+# reduced to one tooth pitch [0, 2*pi/z)
+#---------------------------------------------------
+def meshPhase(parent, gear, angle, parentPhase=0):
+    c, k = meshPhaseTerms(parent.teeth, gear.teeth, angle, parent.internal or gear.internal)
+    return float(np.mod(c + k*parentPhase, 2*pi/gear.teeth))
+
+
+"""
+alignPhases
+Rotation phase (radians, within one tooth pitch) of every gear of a
+GearTrain so that every mesh interlocks. rootPhases {id: phase} sets
+the roots, 0 by default. All the gears are solved at once: each phase
+is an affine function c + k*parentPhase of its parent's, and those are
+composed up to the roots by pointer jumping, log2(depth) numpy steps.
+Returns {id: phase}.
+"""
+def alignPhases(train, rootPhases=None):
+    rootPhases = rootPhases or {}
+    ids = train.order()
+    if not ids:
+        return {}
+    index = {id: i for i, id in enumerate(ids)}
+    parentIds = [train.parent(id) for id in ids]
+    isRoot = np.array([p is None for p in parentIds], dtype=bool)
+    parent = np.array([i if p is None else index[p] for i, p in enumerate(parentIds)], dtype=np.intp)
+    gears = [train.gear(id) for id in ids]
+    teeth = np.array([g.teeth for g in gears], dtype=float)
+    internal = np.array([g.internal for g in gears], dtype=bool)
+    angle = np.array([train.angle(id) or 0 for id in ids], dtype=float)
+
+    c, k = meshPhaseTerms(teeth[parent], teeth, angle, internal | internal[parent])
+    c = np.where(isRoot, [float(rootPhases.get(id, 0)) for id in ids], c)
+    k = np.where(isRoot, 0, k)
+    while True:
+        done = np.array_equal(parent[parent], parent)
+        # phase_i = c_i + k_i*phase_parent, skip to the parent's parent
+        c = c + k*c[parent]
+        k = k*k[parent]
+        parent = parent[parent]
+        if done:
+            break
+    phases = np.mod(c, 2*pi/teeth)
+    return dict(zip(ids, phases.tolist()))
+
+
+"""
+GearTrain
+Forest of gears keyed by any hashable id.
+add(id, gear, x, y):           root gear centred at (x, y)
+mesh(id, gear, parent, angle): gear driven by parent at angle (degrees)
+setGear / setAngle / move / link / unlink / remove edit the train and
+update the positions of the affected subtree only. Linking a gear
+below one of its own descendants is a cycle and raises GearTrainError.
+position(id) and positions() read the centres, order() lists the ids
+parents first.
+"""
+class GearTrain:
+    __slots__ = ('_gears', '_parent', '_angle', '_children', '_offset', '_pos', '_order')
+
+    def __init__(self):
+        self._gears = {}
+        self._parent = {}
+        self._angle = {}
+        self._children = {}
+        # root: its centre, driven gear: centre relative to the parent
+        self._offset = {}
+        self._pos = {}
+        self._order = None
+
+    @classmethod
+    def fromMeshes(cls, gears, roots, meshes):
+        """
+        Build a train from gears {id: Gear}, roots {id: (x, y)} and
+        meshes [(parent, id, angle)], in any order. Gears are placed
+        parents first (Kahn's algorithm); gears left over sit on a
+        cycle, or have two parents, and raise GearTrainError.
+        """
+        parentOf = {}
+        for parent, id, angle in meshes:
+            if id in parentOf or id in roots:
+                raise GearTrainError('gear %r is placed twice' % (id,))
+            parentOf[id] = (parent, angle)
+        waiting = {}
+        for id, (parent, angle) in parentOf.items():
+            waiting.setdefault(parent, []).append(id)
+        train = cls()
+        queue = deque()
+        for id, (x, y) in roots.items():
+            train.add(id, gears[id], x, y)
+            queue.append(id)
+        while queue:
+            for id in waiting.pop(queue.popleft(), ()):
+                train.mesh(id, gears[id], parentOf[id][0], parentOf[id][1])
+                queue.append(id)
+        unplaced = [id for id in parentOf if id not in train._gears]
+        if unplaced:
+            raise GearTrainError('gears without a root, mesh cycle: %r' % (unplaced,))
+        return train
+
+    def __len__(self):
+        return len(self._gears)
+
+    def __contains__(self, id):
+        return id in self._gears
+
+    def __iter__(self):
+        return iter(self.order())
+
+    def gear(self, id):
+        return self._gears[id]
+
+    def parent(self, id):
+        return self._parent[id]
+
+    def children(self, id):
+        return list(self._children[id])
+
+    def angle(self, id):
+        return self._angle.get(id)
+
+    def position(self, id):
+        return self._pos[id]
+
+    def positions(self):
+        return dict(self._pos)
+
+    def roots(self):
+        return [id for id, parent in self._parent.items() if parent is None]
+
+    def order(self):
+        """Ids in topological order, every gear after its parent"""
+        if self._order is None:
+            order = self.roots()
+            for id in order:
+                order.extend(self._children[id])
+            self._order = order
+        return list(self._order)
+
+    def subtree(self, id):
+        """id and all the gears driven from it, parents first"""
+        nodes = [id]
+        for node in nodes:
+            nodes.extend(self._children[node])
+        return nodes
+
+    #---------------------------------------------------
+    def add(self, id, gear, x=0, y=0):
+        self._new(id, gear)
+        self._parent[id] = None
+        self._offset[id] = (x, y)
+        self._pos[id] = (x, y)
+
+    def mesh(self, id, gear, parent, angle):
+        if parent not in self._gears:
+            raise GearTrainError('unknown parent gear %r' % (parent,))
+        offset = meshOffset(self._gears[parent], gear, angle)
+        self._new(id, gear)
+        self._attach(id, parent, angle, offset)
+        self._update(id)
+
+    def setGear(self, id, gear):
+        """Replace the gear of id, its own and its children meshes change"""
+        parent = self._parent[id]
+        offset = self._offset[id]
+        if parent is not None:
+            offset = meshOffset(self._gears[parent], gear, self._angle[id])
+        childOffsets = [(c, meshOffset(gear, self._gears[c], self._angle[c])) for c in self._children[id]]
+        self._gears[id] = gear
+        self._offset[id] = offset
+        self._offset.update(childOffsets)
+        self._update(id)
+
+    def setAngle(self, id, angle):
+        parent = self._parent[id]
+        if parent is None:
+            raise GearTrainError('gear %r is not meshed' % (id,))
+        self._offset[id] = meshOffset(self._gears[parent], self._gears[id], angle)
+        self._angle[id] = angle
+        self._update(id)
+
+    def move(self, id, x, y):
+        """Move a root gear, everything it drives follows"""
+        if self._parent[id] is not None:
+            raise GearTrainError('gear %r is meshed, change its angle or unlink it' % (id,))
+        self._offset[id] = (x, y)
+        self._update(id)
+
+    def link(self, id, parent, angle):
+        """Mesh an existing gear with parent, moving its subtree along"""
+        if parent not in self._gears:
+            raise GearTrainError('unknown parent gear %r' % (parent,))
+        node = parent
+        while node is not None:
+            if node == id:
+                raise GearTrainError('meshing %r with %r makes a cycle' % (id, parent))
+            node = self._parent[node]
+        offset = meshOffset(self._gears[parent], self._gears[id], angle)
+        self._detach(id)
+        self._attach(id, parent, angle, offset)
+        self._update(id)
+
+    def unlink(self, id):
+        """Make id a root where it stands"""
+        if self._parent[id] is not None:
+            self._detach(id)
+            self._parent[id] = None
+            self._offset[id] = self._pos[id]
+
+    def remove(self, id):
+        """Drop a gear, the gears it drove stay in place as roots"""
+        for child in list(self._children[id]):
+            self.unlink(child)
+        self._detach(id)
+        for table in (self._gears, self._parent, self._children, self._offset, self._pos):
+            del table[id]
+
+    #---------------------------------------------------
+    def _new(self, id, gear):
+        if id in self._gears:
+            raise GearTrainError('gear %r already in the train' % (id,))
+        self._gears[id] = gear
+        self._children[id] = []
+        self._order = None
+
+    def _attach(self, id, parent, angle, offset):
+        self._parent[id] = parent
+        self._angle[id] = angle
+        self._offset[id] = offset
+        self._children[parent].append(id)
+        self._order = None
+
+    def _detach(self, id):
+        parent = self._parent[id]
+        if parent is not None:
+            self._children[parent].remove(id)
+        self._angle.pop(id, None)
+        self._order = None
+
+    # positions of id and its subtree from the stored offsets
+    def _update(self, id):
+        pos = self._pos
+        offset = self._offset
+        parent = self._parent
+        for node in self.subtree(id):
+            dx, dy = offset[node]
+            p = parent[node]
+            if p is None:
+                pos[node] = (dx, dy)
+            else:
+                px, py = pos[p]
+                pos[node] = (px + dx, py + dy)